@@ -305,7 +305,7 @@ async def sheets_export_command(update: Update, context: ContextTypes.DEFAULT_TY
         await update.message.reply_text("⏳ Выгружаю данные в Google Sheets...")
 
         try:
-            url = await sync_user_to_sheets_async(db, user.id, user.google_sheets_spreadsheet_id)
+            url = await sync_user_to_sheets_async(db, user.id, user.google_sheets_spreadsheet_id, user)
         except GoogleSheetsNotConfigured as e:
             await update.message.reply_text(f"❌ Ошибка: {str(e)}")
             return
@@ -337,10 +337,7 @@ async def sheets_import_command(update: Update, context: ContextTypes.DEFAULT_TY
         user = get_or_create_user(db, update.effective_user.id)
 
         from services.google_sheets_client import is_configured, GoogleSheetsNotConfigured
-        from services.sheets_import import (
-            parse_accounts_from_balances_sheet,
-            parse_transactions_from_month_sheets,
-        )
+        from services.sheets_import import parse_spreadsheet
         from services.ledger import clear_user_data, create_account, create_transaction_raw
         from db.models import Account, Transaction
 
@@ -364,15 +361,10 @@ async def sheets_import_command(update: Update, context: ContextTypes.DEFAULT_TY
         await update.message.reply_text("⏳ Загружаю данные из Google Sheets...")
 
         try:
-            # Parse accounts from "Балансы" sheet
-            imported_accounts = await asyncio.to_thread(
-                parse_accounts_from_balances_sheet,
-                user.google_sheets_spreadsheet_id,
-            )
-            
-            # Parse transactions from all YYYY-MM sheets
-            imported_transactions = await asyncio.to_thread(
-                parse_transactions_from_month_sheets,
+            # Parse accounts from "Балансы" and transactions from all YYYY-MM sheets
+            # (one batched read for all sheets)
+            imported_accounts, imported_transactions = await asyncio.to_thread(
+                parse_spreadsheet,
                 user.google_sheets_spreadsheet_id,
                 db,
                 user.id,
@@ -649,12 +641,16 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def voice_message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle voice messages - transcribe and process as text."""
-    from services.speech import transcribe_telegram_voice
+    from services.speech import is_enabled as speech_enabled, transcribe_telegram_voice
     
     voice = update.message.voice
     if not voice:
         return
     
+    if not speech_enabled():
+        await update.message.reply_text("🎤 Голосовой ввод не настроен. Напиши сообщение текстом.")
+        return
+    
     # Send "processing" message
     processing_msg = await update.message.reply_text("🎤 Распознаю голосовое сообщение...")
     
@@ -1832,7 +1828,7 @@ def execute_single_operation(db: Session, user: User, intent: str, data_dict: di
             tz = get_user_timezone(user.timezone)
             operation_date = datetime.fromisoformat(data_dict["operation_date"].replace("Z", "+00:00"))
             if not operation_date.tzinfo:
-                operation_date = tz.localize(operation_date)
+                operation_date = operation_date.replace(tzinfo=tz)
         
         add_income(
             db,
@@ -1874,7 +1870,7 @@ def execute_single_operation(db: Session, user: User, intent: str, data_dict: di
             tz = get_user_timezone(user.timezone)
             operation_date = datetime.fromisoformat(data_dict["operation_date"].replace("Z", "+00:00"))
             if not operation_date.tzinfo:
-                operation_date = tz.localize(operation_date)
+                operation_date = operation_date.replace(tzinfo=tz)
         
         add_expense(
             db,
@@ -1904,7 +1900,7 @@ def execute_single_operation(db: Session, user: User, intent: str, data_dict: di
             tz = get_user_timezone(user.timezone)
             operation_date = datetime.fromisoformat(data_dict["operation_date"].replace("Z", "+00:00"))
             if not operation_date.tzinfo:
-                operation_date = tz.localize(operation_date)
+                operation_date = operation_date.replace(tzinfo=tz)
         
         # Handle cross-currency transfers
         to_amount = None
@@ -2016,7 +2012,7 @@ async def handle_confirm(db: Session, query, pending_id: int):
         
         # Check if this is sheets_import
         if intent == "sheets_import" or pending.action_type == ActionType.SHEETS_IMPORT:
-            from services.ledger import clear_user_data, create_account, create_transaction_raw
+            from services.ledger import clear_user_data, create_account, create_transactions_bulk
             
             try:
                 imported_data = payload.get("imported_data", {})
@@ -2058,7 +2054,7 @@ async def handle_confirm(db: Session, query, pending_id: int):
                     user.default_account_id = first_account_id
                 
                 # 3. Create transactions WITHOUT updating balances
-                transactions_created = 0
+                tx_rows = []
                 for tx_dict in transactions_data:
                     try:
                         # Find account by name
@@ -2068,21 +2064,20 @@ async def handle_confirm(db: Session, query, pending_id: int):
                             account_id = first_account_id
                         
                         if account_id and tx_dict.get("operation_date"):
-                            create_transaction_raw(
-                                db=db,
-                                user_id=user.id,
-                                transaction_type=tx_dict["transaction_type"],
-                                amount=Decimal(str(tx_dict["amount"])),
-                                currency=tx_dict["currency"],
-                                account_id=account_id,
-                                category=tx_dict.get("category"),
-                                description=tx_dict.get("description"),
-                                operation_date=datetime.fromisoformat(tx_dict["operation_date"]),
-                            )
-                            transactions_created += 1
+                            tx_rows.append({
+                                "transaction_type": tx_dict["transaction_type"],
+                                "amount": Decimal(str(tx_dict["amount"])),
+                                "currency": tx_dict["currency"],
+                                "account_id": account_id,
+                                "category": tx_dict.get("category"),
+                                "description": tx_dict.get("description"),
+                                "operation_date": datetime.fromisoformat(tx_dict["operation_date"]),
+                            })
                     except Exception as e:
                         logger.error(f"Failed to create transaction: {e}")
                 
+                transactions_created = create_transactions_bulk(db, user.id, tx_rows)
+                
                 db.commit()
                 pending.status = PendingStatus.CONFIRMED
                 db.commit()
@@ -2159,7 +2154,7 @@ async def handle_confirm(db: Session, query, pending_id: int):
                 tz = get_user_timezone(user.timezone)
                 operation_date = datetime.fromisoformat(data_dict["operation_date"].replace("Z", "+00:00"))
                 if not operation_date.tzinfo:
-                    operation_date = tz.localize(operation_date)
+                    operation_date = operation_date.replace(tzinfo=tz)
             
             add_income(
                 db,
@@ -2202,7 +2197,7 @@ async def handle_confirm(db: Session, query, pending_id: int):
                 tz = get_user_timezone(user.timezone)
                 operation_date = datetime.fromisoformat(data_dict["operation_date"].replace("Z", "+00:00"))
                 if not operation_date.tzinfo:
-                    operation_date = tz.localize(operation_date)
+                    operation_date = operation_date.replace(tzinfo=tz)
             
             add_expense(
                 db,
@@ -2233,7 +2228,7 @@ async def handle_confirm(db: Session, query, pending_id: int):
                 tz = get_user_timezone(user.timezone)
                 operation_date = datetime.fromisoformat(data_dict["operation_date"].replace("Z", "+00:00"))
                 if not operation_date.tzinfo:
-                    operation_date = tz.localize(operation_date)
+                    operation_date = operation_date.replace(tzinfo=tz)
             
             # Handle cross-currency transfers
             to_amount = None
@@ -5,9 +5,11 @@ from enum import Enum as PyEnum
 
 from sqlalchemy import (
     Column, Integer, String, DateTime, ForeignKey, 
-    DECIMAL, Boolean, Text, Enum as SQLEnum, JSON
+    DECIMAL, Boolean, Text, Enum as SQLEnum, JSON, Index, BigInteger, cast, func
 )
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.sql.functions import FunctionElement
 
 Base = declarative_base()
 
@@ -113,12 +115,51 @@ class Transaction(Base):
     operation_date = Column(DateTime, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    # Composite indexes for per-user period queries (lists, reports, insights)
+    __table_args__ = (
+        Index("ix_tx_user_date", user_id, operation_date.desc()),
+        # Reports/insights filter on (user, type, period) and aggregate these columns;
+        # INCLUDE makes that an index-only scan on Postgres
+        Index(
+            "ix_tx_user_type_date_inc", user_id, type, operation_date,
+            postgresql_include=["currency", "category", "amount"],
+        ),
+        Index("ix_tx_user_category_date", user_id, category, operation_date),
+    )
+
     # Relationships
     user = relationship("User", back_populates="transactions")
     account = relationship("Account", foreign_keys=[account_id], back_populates="transactions_to")
     from_account = relationship("Account", foreign_keys=[from_account_id], back_populates="transactions_from")
 
 
+# Transaction amount in integer cents: aggregates are summed as ints, not Decimals
+TRANSACTION_AMOUNT_CENTS = cast(func.round(Transaction.amount * 100), BigInteger)
+
+
+def sum_cents(cents=TRANSACTION_AMOUNT_CENTS):
+    """SUM of integer cents as BIGINT (Postgres widens SUM(bigint) to numeric, i.e. Decimal)."""
+    return cast(func.sum(cents), BigInteger)
+
+
+class unicode_lower(FunctionElement):
+    """lower() that also lowercases non-ASCII text (Cyrillic) on SQLite."""
+    type = String()
+    name = "unicode_lower"
+    inherit_cache = True
+
+
+@compiles(unicode_lower)
+def _compile_unicode_lower(element, compiler, **kw):
+    return f"lower({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(unicode_lower, "sqlite")
+def _compile_unicode_lower_sqlite(element, compiler, **kw):
+    # SQLite's built-in lower() is ASCII-only; py_lower is registered in db.session
+    return f"py_lower({compiler.process(element.clauses, **kw)})"
+
+
 class PendingAction(Base):
     """Pending action model for confirmations."""
     __tablename__ = "pending_actions"
@@ -1,6 +1,6 @@
 """Database session management."""
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 from sqlalchemy import text
@@ -11,6 +11,15 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./smartfinances.db")
 
+# Compiled-statement cache; report/export/insight queries differ only in bind values
+QUERY_CACHE_SIZE = 1200
+
+
+def _unicode_lower(value):
+    """Python str.lower() for SQLite's py_lower(); NULL and non-text values pass through."""
+    return value.lower() if isinstance(value, str) else value
+
+
 # For SQLite, use StaticPool to allow multiple threads
 if DATABASE_URL.startswith("sqlite"):
     engine = create_engine(
@@ -18,9 +27,19 @@ if DATABASE_URL.startswith("sqlite"):
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
         echo=False,
+        query_cache_size=QUERY_CACHE_SIZE,
     )
+
+    @event.listens_for(engine, "connect")
+    def _register_sqlite_functions(dbapi_connection, connection_record):
+        """Register py_lower(): SQLite's built-in lower() only lowercases ASCII.
+
+        Used through db.models.unicode_lower (plain lower() on other backends);
+        lower() itself keeps its built-in behaviour.
+        """
+        dbapi_connection.create_function("py_lower", 1, _unicode_lower, deterministic=True)
 else:
-    engine = create_engine(DATABASE_URL, echo=False)
+    engine = create_engine(DATABASE_URL, echo=False, query_cache_size=QUERY_CACHE_SIZE)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -38,12 +57,21 @@ def init_db():
     """Initialize database tables."""
     from db.models import Base
     Base.metadata.create_all(bind=engine)
+    _ensure_indexes()
 
     # Lightweight migrations for SQLite (no Alembic in this project)
     if DATABASE_URL.startswith("sqlite"):
         _ensure_sqlite_schema()
 
 
+def _ensure_indexes() -> None:
+    """Create indexes added to existing tables (create_all skips tables that exist)."""
+    from db.models import Base
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
 def _ensure_sqlite_schema() -> None:
     """Ensure new nullable columns exist on SQLite tables."""
     with engine.connect() as conn:
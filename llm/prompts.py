@@ -1,7 +1,7 @@
 """Prompts for LLM."""
 from typing import List, Dict
 from datetime import datetime
-import pytz
+from zoneinfo import ZoneInfo
 
 
 def build_system_prompt() -> str:
@@ -286,7 +286,7 @@ def build_user_prompt(
     current_datetime: datetime = None
 ) -> str:
     """Build user prompt with context."""
-    tz = pytz.timezone("Europe/London")
+    tz = ZoneInfo("Europe/London")
     if current_datetime is None:
         current_datetime = datetime.now(tz)
     
@@ -12,6 +12,7 @@ from bot.handlers import (
     message_handler, voice_message_handler, callback_handler
 )
 from db.session import init_db
+from services.speech import close_session as close_speech_session, is_enabled as speech_enabled
 
 # Load environment variables
 load_dotenv()
@@ -24,6 +25,11 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def post_shutdown(application: Application) -> None:
+    """Release shared HTTP clients."""
+    await close_speech_session()
+
+
 def main():
     """Main function to start the bot."""
     # Initialize database
@@ -52,6 +58,7 @@ def main():
         .request(request)
         .get_updates_request(request)
         .concurrent_updates(False)
+        .post_shutdown(post_shutdown)
         .build()
     )
     
@@ -66,6 +73,8 @@ def main():
     application.add_handler(CallbackQueryHandler(callback_handler))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler))
     application.add_handler(MessageHandler(filters.VOICE, voice_message_handler))
+    if not speech_enabled():
+        logger.warning("SPEECHFLOW_KEY_ID / SPEECHFLOW_KEY_SECRET not set: voice messages are disabled")
     
     # Start bot
     logger.info("Starting bot...")
@@ -9,7 +9,7 @@ from __future__ import annotations
 
 import os
 import logging
-from typing import Optional
+from typing import Callable, Iterable, Optional
 
 from googleapiclient.discovery import build
 from google.oauth2.service_account import Credentials as ServiceAccountCredentials
@@ -90,41 +90,62 @@ def get_spreadsheet_url(spreadsheet_id: Optional[str] = None, gid: Optional[int]
     return f"https://docs.google.com/spreadsheets/d/{sid}/edit#gid={gid}"
 
 
-def ensure_sheet(spreadsheet_id: str, title: str) -> int:
-    """Ensure a sheet(tab) exists and return its sheetId (gid)."""
+def ensure_sheets(
+    spreadsheet_id: str,
+    titles: Iterable[str],
+    delete_if: Optional[Callable[[str], bool]] = None,
+) -> dict[str, int]:
+    """Ensure sheets(tabs) exist and return {title: sheetId (gid)}.
+
+    Uses one metadata request and at most one batchUpdate. Other existing sheets
+    for which delete_if(title) is true are deleted in the same batchUpdate.
+    """
+    titles = list(titles)
     service = get_sheets_service()
     meta = (
         service.spreadsheets()
         .get(spreadsheetId=spreadsheet_id, fields="sheets(properties(sheetId,title))")
         .execute()
     )
-    for sh in meta.get("sheets", []):
-        props = sh.get("properties", {})
-        if props.get("title") == title:
-            return int(props["sheetId"])
+    existing = {sh["properties"]["title"]: int(sh["properties"]["sheetId"]) for sh in meta.get("sheets", [])}
+    
+    wanted = set(titles)
+    missing = [title for title in titles if title not in existing]
+    stale = [title for title in existing if title not in wanted and delete_if is not None and delete_if(title)]
+    
+    if missing or stale:
+        # addSheet goes first so the spreadsheet never ends up without sheets
+        requests = [{"addSheet": {"properties": {"title": title}}} for title in missing]
+        requests += [{"deleteSheet": {"sheetId": existing[title]}} for title in stale]
+        resp = service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body={"requests": requests}).execute()
+        replies = resp.get("replies", [])
+        for title, reply in zip(missing, replies):
+            if "addSheet" not in reply:
+                raise RuntimeError("Failed to create sheet")
+            existing[title] = int(reply["addSheet"]["properties"]["sheetId"])
+        for title in stale:
+            logger.info(f"Deleted sheet: {title}")
+    
+    return {title: existing[title] for title in titles}
 
-    body = {"requests": [{"addSheet": {"properties": {"title": title}}}]}
-    resp = service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body=body).execute()
-    replies = resp.get("replies", [])
-    if not replies or "addSheet" not in replies[0]:
-        raise RuntimeError("Failed to create sheet")
-    return int(replies[0]["addSheet"]["properties"]["sheetId"])
 
+def batch_clear_and_update_values(spreadsheet_id: str, sheets: dict[str, Iterable[list[object]]]) -> None:
+    """Replace several sheets starting from A1 with one values.batchClear and one values.batchUpdate call.
 
-def clear_and_update_values(spreadsheet_id: str, sheet_title: str, values: list[list[object]]) -> None:
-    """Replace the entire sheet starting from A1 with provided values."""
+    sheets maps sheet title to its values (list or row iterator).
+    """
+    if not sheets:
+        return
     service = get_sheets_service()
-    # Clear the entire sheet (not just A1!)
-    clear_range = f"'{sheet_title}'"
-    service.spreadsheets().values().clear(spreadsheetId=spreadsheet_id, range=clear_range, body={}).execute()
+    service.spreadsheets().values().batchClear(
+        spreadsheetId=spreadsheet_id,
+        body={"ranges": [f"'{title}'" for title in sheets]},
+    ).execute()
     
-    # Write new values starting from A1
-    update_range = f"'{sheet_title}'!A1"
-    service.spreadsheets().values().update(
+    data = [{"range": f"'{title}'!A1", "values": list(values)} for title, values in sheets.items()]
+    service.spreadsheets().values().batchUpdate(
         spreadsheetId=spreadsheet_id,
-        range=update_range,
-        valueInputOption="USER_ENTERED",
-        body={"values": values},
+        body={"valueInputOption": "USER_ENTERED", "data": data},
     ).execute()
 
 
@@ -144,38 +165,25 @@ def read_sheet_values(spreadsheet_id: str, sheet_title: str) -> list[list]:
         raise
 
 
-def get_all_sheet_titles(spreadsheet_id: str) -> list[str]:
-    """Get all sheet titles in a spreadsheet."""
-    service = get_sheets_service()
-    meta = (
-        service.spreadsheets()
-        .get(spreadsheetId=spreadsheet_id, fields="sheets(properties(title))")
-        .execute()
-    )
-    return [sh["properties"]["title"] for sh in meta.get("sheets", [])]
-
+def read_sheets_values_batch(spreadsheet_id: str, sheet_titles: list[str]) -> dict[str, list[list]]:
+    """Read several sheets with one values.batchGet call. Returns {title: 2D list of cell values}.
 
-def delete_sheet_by_title(spreadsheet_id: str, title: str) -> None:
-    """Delete a sheet by title. Does nothing if sheet doesn't exist."""
+    The whole call fails if any of the sheets does not exist.
+    """
+    if not sheet_titles:
+        return {}
     service = get_sheets_service()
-    # Get sheet ID
-    meta = (
-        service.spreadsheets()
-        .get(spreadsheetId=spreadsheet_id, fields="sheets(properties(sheetId,title))")
-        .execute()
-    )
-    sheet_id = None
-    for sh in meta.get("sheets", []):
-        props = sh.get("properties", {})
-        if props.get("title") == title:
-            sheet_id = props["sheetId"]
-            break
-    
-    if sheet_id is None:
-        return  # Sheet doesn't exist
-    
-    body = {"requests": [{"deleteSheet": {"sheetId": sheet_id}}]}
-    service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body=body).execute()
-    logger.info(f"Deleted sheet: {title}")
-
+    try:
+        result = (
+            service.spreadsheets()
+            .values()
+            .batchGet(spreadsheetId=spreadsheet_id, ranges=[f"'{title}'" for title in sheet_titles])
+            .execute()
+        )
+    except Exception as e:
+        logger.error(f"Failed to batch read sheets {sheet_titles}: {e}")
+        raise
+    # valueRanges come back in request order
+    value_ranges = result.get("valueRanges", [])
+    return {title: vr.get("values", []) for title, vr in zip(sheet_titles, value_ranges)}
 
@@ -1,19 +1,34 @@
 """Insights service for analytical questions."""
+import heapq
 import logging
 from decimal import Decimal
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from collections import defaultdict
+from functools import partial, lru_cache
 
-from sqlalchemy import func, and_, desc
+from sqlalchemy import func, and_, desc, select, literal, cast, String, union_all, bindparam
 from sqlalchemy.orm import Session
 
-from db.models import User, Account, Transaction, TransactionType
-from utils.dates import parse_period, get_prev_period, format_date
-from utils.money import format_amount
+from db.models import User, Account, Transaction, TransactionType, TRANSACTION_AMOUNT_CENTS, sum_cents
+from utils.dates import parse_period, get_prev_period, format_date, now_in_timezone
+from utils.money import format_amount, from_cents
 
 logger = logging.getLogger(__name__)
 
+# Periods up to this many transactions are aggregated in Python from one fetch
+# instead of separate ORDER BY / GROUP BY queries
+IN_MEMORY_TOPS_MAX_ROWS = 5000
+
+# Columns of top transactions used by formatting (rows instead of ORM objects)
+TOP_TRANSACTION_COLUMNS = (
+    Transaction.description,
+    Transaction.category,
+    Transaction.amount,
+    Transaction.currency,
+    Transaction.operation_date,
+)
+
 
 def get_insight(
     db: Session,
@@ -37,8 +52,8 @@ def get_insight(
             "baseline_total": Decimal,
             "delta": Decimal,
             "delta_pct": float,
-            "top_transactions": [Transaction],
-            "top_days": [{"date": datetime, "amount": Decimal}],
+            "top_transactions": [Row(description, category, amount, currency, operation_date)],
+            "top_days": [{"date": date, "amount": Decimal}],
             "top_merchants": [{"description": str, "amount": Decimal}],
             "period": {"from": datetime, "to": datetime},
             "baseline_period": {"from": datetime, "to": datetime}
@@ -48,16 +63,19 @@ def get_insight(
     if not user:
         raise ValueError(f"User {user_id} not found")
     
+    # Read the clock once so current and baseline periods agree across midnight
+    now = now_in_timezone(user.timezone)
+
     # Parse current period
-    start, end = parse_period(period_preset, from_date, to_date, user.timezone)
+    start, end = parse_period(period_preset, from_date, to_date, user.timezone, now=now)
     
     # Get baseline period
     if compare_to == "prev_period":
-        baseline_start, baseline_end = get_prev_period(period_preset or "month", user.timezone)
+        baseline_start, baseline_end = get_prev_period(period_preset or "month", user.timezone, now=now)
     elif compare_to == "prev_month":
-        baseline_start, baseline_end = get_prev_period("month", user.timezone)
+        baseline_start, baseline_end = get_prev_period("month", user.timezone, now=now)
     elif compare_to == "prev_year":
-        baseline_start, baseline_end = get_prev_period("year", user.timezone)
+        baseline_start, baseline_end = get_prev_period("year", user.timezone, now=now)
     elif compare_to == "avg_3m":
         # Average of last 3 months
         baseline_start = start - timedelta(days=90)
@@ -66,21 +84,15 @@ def get_insight(
         baseline_start = None
         baseline_end = None
     
-    # Build query filters
-    filters = [
-        Transaction.user_id == user_id,
-        Transaction.operation_date >= start,
-        Transaction.operation_date <= end
-    ]
-    
+    # Build query filter shape; actual values go to bind params
+    transaction_type = None
     if metric == "expense":
-        filters.append(Transaction.type == TransactionType.EXPENSE)
+        transaction_type = TransactionType.EXPENSE
     elif metric == "income":
-        filters.append(Transaction.type == TransactionType.INCOME)
+        transaction_type = TransactionType.INCOME
     # For "net", we'll calculate separately
     
-    if category:
-        filters.append(Transaction.category == category)
+    params = {"user_id": user_id, "category": category, "currency": currency, "account_id": None}
     
     if account_name:
         account = db.query(Account).filter(
@@ -88,68 +100,40 @@ def get_insight(
             Account.name.ilike(f"%{account_name}%")
         ).first()
         if account:
-            if metric == "expense" or metric == "net":
-                filters.append(Transaction.account_id == account.id)
-            elif metric == "income":
-                filters.append(Transaction.account_id == account.id)
+            params["account_id"] = account.id
     
-    if currency:
-        filters.append(Transaction.currency == currency)
+    shape = (transaction_type, bool(category), params["account_id"] is not None, bool(currency))
     
-    # Get current total
-    current_total = db.query(func.sum(Transaction.amount)).filter(*filters).scalar() or Decimal("0.00")
+    # Get current total (and size of the period to choose how to compute tops)
+    totals_stmt = _totals_statement(shape)
+    current_cents, current_count = db.execute(totals_stmt, {**params, "start": start, "end": end}).one()
     
-    # Get baseline total
-    baseline_total = Decimal("0.00")
+    # Get baseline total (same statement, baseline period)
+    baseline_cents = 0
     if baseline_start and baseline_end:
-        baseline_filters = filters.copy()
-        baseline_filters[1] = Transaction.operation_date >= baseline_start
-        baseline_filters[2] = Transaction.operation_date <= baseline_end
-        baseline_total = db.query(func.sum(Transaction.amount)).filter(*baseline_filters).scalar() or Decimal("0.00")
+        baseline_params = {**params, "start": baseline_start, "end": baseline_end}
+        baseline_cents = db.execute(totals_stmt, baseline_params).one()[0]
     
     # Calculate delta
-    delta = current_total - baseline_total
+    delta_cents = current_cents - baseline_cents
     delta_pct = 0.0
-    if baseline_total > 0:
-        delta_pct = float((delta / baseline_total) * 100)
-    
-    # Get top transactions
-    top_transactions = db.query(Transaction).filter(*filters).order_by(
-        desc(Transaction.amount)
-    ).limit(10).all()
-    
-    # Get top days (aggregate by date)
-    top_days_raw = db.query(
-        func.date(Transaction.operation_date).label("date"),
-        func.sum(Transaction.amount).label("total")
-    ).filter(*filters).group_by(
-        func.date(Transaction.operation_date)
-    ).order_by(desc("total")).limit(10).all()
-    
-    top_days = [
-        {"date": row.date, "amount": row.total}
-        for row in top_days_raw
-    ]
-    
-    # Get top merchants/descriptions (if available)
-    top_merchants_raw = db.query(
-        Transaction.description,
-        func.sum(Transaction.amount).label("total")
-    ).filter(
-        *filters,
-        Transaction.description.isnot(None),
-        Transaction.description != ""
-    ).group_by(Transaction.description).order_by(desc("total")).limit(10).all()
+    if baseline_cents > 0:
+        delta_pct = delta_cents * 100 / baseline_cents
     
-    top_merchants = [
-        {"description": row.description, "amount": row.total}
-        for row in top_merchants_raw
-    ]
+    # Get top transactions, days and merchants
+    period_params = {**params, "start": start, "end": end}
+    if current_count == 0:
+        # Nothing in the period - skip the top-N queries
+        top_transactions, top_days, top_merchants = [], [], []
+    elif current_count <= IN_MEMORY_TOPS_MAX_ROWS:
+        top_transactions, top_days, top_merchants = _get_tops_in_memory(db, shape, period_params)
+    else:
+        top_transactions, top_days, top_merchants = _get_tops_from_db(db, shape, period_params)
     
     return {
-        "current_total": current_total,
-        "baseline_total": baseline_total,
-        "delta": delta,
+        "current_total": from_cents(current_cents),
+        "baseline_total": from_cents(baseline_cents),
+        "delta": from_cents(delta_cents),
         "delta_pct": round(delta_pct, 1),
         "top_transactions": top_transactions,
         "top_days": top_days,
@@ -162,6 +146,129 @@ def get_insight(
     }
 
 
+@lru_cache(maxsize=64)
+def _period_conditions(shape: Tuple) -> Tuple:
+    """
+    Build period filter conditions for a filter shape.
+    shape = (transaction_type, has_category, has_account, has_currency);
+    values are bound at execution: user_id, start, end, category, account_id, currency.
+    """
+    transaction_type, has_category, has_account, has_currency = shape
+    conditions = [
+        Transaction.user_id == bindparam("user_id"),
+        Transaction.operation_date.between(bindparam("start"), bindparam("end")),
+    ]
+    if transaction_type is not None:
+        conditions.append(Transaction.type == transaction_type)
+    if has_category:
+        conditions.append(Transaction.category == bindparam("category"))
+    if has_account:
+        conditions.append(Transaction.account_id == bindparam("account_id"))
+    if has_currency:
+        conditions.append(Transaction.currency == bindparam("currency"))
+    return tuple(conditions)
+
+
+@lru_cache(maxsize=64)
+def _totals_statement(shape: Tuple):
+    """SUM (in cents) and COUNT of period transactions."""
+    return select(
+        func.coalesce(sum_cents(), 0),
+        func.count(Transaction.id)
+    ).where(*_period_conditions(shape))
+
+
+@lru_cache(maxsize=64)
+def _period_rows_statement(shape: Tuple):
+    """All period transactions (top transaction columns only), in id order for stable ties."""
+    return select(*TOP_TRANSACTION_COLUMNS).where(
+        *_period_conditions(shape)
+    ).order_by(Transaction.id)
+
+
+@lru_cache(maxsize=64)
+def _top_transactions_statement(shape: Tuple, limit: int):
+    """Largest period transactions (ties: lower id first)."""
+    return select(*TOP_TRANSACTION_COLUMNS).where(
+        *_period_conditions(shape)
+    ).order_by(desc(Transaction.amount), Transaction.id).limit(limit)
+
+
+@lru_cache(maxsize=64)
+def _top_days_and_merchants_statement(shape: Tuple, limit: int):
+    """Top days and top merchants/descriptions in one query over the period."""
+    period_rows = select(
+        func.date(Transaction.operation_date).label("day"),
+        Transaction.description,
+        TRANSACTION_AMOUNT_CENTS.label("amount_cents")
+    ).where(*_period_conditions(shape)).cte("period_rows")
+    
+    days = select(
+        literal("day").label("kind"),
+        cast(period_rows.c.day, String).label("key"),
+        sum_cents(period_rows.c.amount_cents).label("total")
+    ).group_by(period_rows.c.day).order_by(desc("total"), period_rows.c.day).limit(limit).subquery()
+    
+    merchants = select(
+        literal("merchant").label("kind"),
+        period_rows.c.description.label("key"),
+        sum_cents(period_rows.c.amount_cents).label("total")
+    ).where(
+        period_rows.c.description.isnot(None),
+        period_rows.c.description != ""
+    ).group_by(period_rows.c.description).order_by(
+        desc("total"), period_rows.c.description
+    ).limit(limit).subquery()
+    
+    return union_all(select(days), select(merchants))
+
+
+def _get_tops_in_memory(db: Session, shape: Tuple, params: Dict, limit: int = 10) -> Tuple[List, List[Dict], List[Dict]]:
+    """
+    Compute top transactions, days and merchants from a single fetch of period rows.
+    Returns the same rows, types and tie order as _get_tops_from_db.
+    """
+    rows = db.execute(_period_rows_statement(shape), params).all()
+    
+    # Amounts are exact 2-place Decimals, so Decimal sums match the SQL cent sums
+    day_totals = defaultdict(Decimal)
+    merchant_totals = defaultdict(Decimal)
+    for row in rows:
+        day_totals[row.operation_date.date()] += row.amount
+        if row.description:
+            merchant_totals[row.description] += row.amount
+    
+    # Partial heap selection: O(n log k) instead of sorting every row/group.
+    # nlargest is stable, so equal amounts keep id order (as ORDER BY ... id)
+    top_transactions = heapq.nlargest(limit, rows, key=lambda row: row.amount)
+    top_days = [
+        {"date": day, "amount": total}
+        for day, total in heapq.nsmallest(limit, day_totals.items(), key=lambda item: (-item[1], item[0]))
+    ]
+    top_merchants = [
+        {"description": description, "amount": total}
+        for description, total in heapq.nsmallest(limit, merchant_totals.items(), key=lambda item: (-item[1], item[0]))
+    ]
+    return top_transactions, top_days, top_merchants
+
+
+def _get_tops_from_db(db: Session, shape: Tuple, params: Dict, limit: int = 10) -> Tuple[List, List[Dict], List[Dict]]:
+    """Compute top transactions, days and merchants with SQL aggregation (large periods)."""
+    top_transactions = db.execute(_top_transactions_statement(shape, limit), params).all()
+    
+    rows = db.execute(_top_days_and_merchants_statement(shape, limit), params).all()
+    
+    top_days = []
+    top_merchants = []
+    # UNION ALL does not keep branch order; ISO day keys sort like dates
+    for row in sorted(rows, key=lambda row: (-row.total, row.key)):
+        if row.kind == "day":
+            top_days.append({"date": date.fromisoformat(row.key), "amount": from_cents(row.total)})
+        else:
+            top_merchants.append({"description": row.key, "amount": from_cents(row.total)})
+    return top_transactions, top_days, top_merchants
+
+
 def format_insight_text(insight: Dict, user_timezone: str = "Europe/London") -> str:
     """Format insight as text message."""
     lines = []
@@ -184,66 +291,60 @@ def format_insight_text(insight: Dict, user_timezone: str = "Europe/London") ->
     delta = insight["delta"]
     delta_pct = insight["delta_pct"]
     
+    fmt_amount = partial(format_amount, currency=currency)
+    
     # Main fact
     if baseline > 0:
         if delta > 0:
-            lines.append(
-                f"📊 Ты потратил{category_str} в период {start_str}–{end_str}: "
-                f"{format_amount(current, currency)}. "
-                f"Это на {format_amount(abs(delta), currency)} ({abs(delta_pct)}%) больше, "
-                f"чем в предыдущем периоде ({format_amount(baseline, currency)})."
+            comparison = (
+                f"Это на {fmt_amount(abs(delta))} ({abs(delta_pct)}%) больше, "
+                f"чем в предыдущем периоде ({fmt_amount(baseline)})."
             )
         elif delta < 0:
-            lines.append(
-                f"📊 Ты потратил{category_str} в период {start_str}–{end_str}: "
-                f"{format_amount(current, currency)}. "
-                f"Это на {format_amount(abs(delta), currency)} ({abs(delta_pct)}%) меньше, "
-                f"чем в предыдущем периоде ({format_amount(baseline, currency)})."
+            comparison = (
+                f"Это на {fmt_amount(abs(delta))} ({abs(delta_pct)}%) меньше, "
+                f"чем в предыдущем периоде ({fmt_amount(baseline)})."
             )
         else:
-            lines.append(
-                f"📊 Ты потратил{category_str} в период {start_str}–{end_str}: "
-                f"{format_amount(current, currency)}. "
-                f"Это столько же, сколько в предыдущем периоде."
-            )
+            comparison = "Это столько же, сколько в предыдущем периоде."
     else:
-        lines.append(
-            f"📊 Ты потратил{category_str} в период {start_str}–{end_str}: "
-            f"{format_amount(current, currency)}. "
-            f"Раньше нет данных для сравнения."
-        )
+        comparison = "Раньше нет данных для сравнения."
     
+    lines.append(
+        f"📊 Ты потратил{category_str} в период {start_str}–{end_str}: "
+        f"{fmt_amount(current)}. {comparison}"
+    )
     lines.append("")
     
     # Top transactions
     top_transactions = insight["top_transactions"]
     if top_transactions:
         lines.append("🔝 Основной вклад дали:")
-        for i, txn in enumerate(top_transactions[:5], 1):
-            desc = txn.description or txn.category or "Без описания"
-            lines.append(
-                f"  {i}. {desc} — {format_amount(txn.amount, txn.currency)} "
-                f"({format_date(txn.operation_date)})"
-            )
+        lines.extend(
+            f"  {i}. {txn.description or txn.category or 'Без описания'} — "
+            f"{format_amount(txn.amount, txn.currency)} ({format_date(txn.operation_date)})"
+            for i, txn in enumerate(top_transactions[:5], 1)
+        )
         lines.append("")
     
     # Top days
     top_days = insight["top_days"]
     if top_days:
         lines.append("📅 Пик был:")
-        for day_info in top_days[:5]:
-            lines.append(
-                f"  • {format_date(day_info['date'])} — {format_amount(day_info['amount'], currency)}"
-            )
+        lines.extend(
+            f"  • {format_date(day_info['date'])} — {fmt_amount(day_info['amount'])}"
+            for day_info in top_days[:5]
+        )
         lines.append("")
     
     # Top merchants
     top_merchants = insight["top_merchants"]
     if top_merchants:
         lines.append("🏪 По местам:")
-        for i, merch in enumerate(top_merchants[:5], 1):
-            lines.append(f"  {i}. {merch['description']} — {format_amount(merch['amount'], currency)}")
+        lines.extend(
+            f"  {i}. {merch['description']} — {fmt_amount(merch['amount'])}"
+            for i, merch in enumerate(top_merchants[:5], 1)
+        )
         lines.append("")
     
     return "\n".join(lines)
-
@@ -2,16 +2,43 @@
 import logging
 from decimal import Decimal
 from datetime import datetime, date
-from typing import Optional, List, Tuple
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, List, Tuple
 
+from sqlalchemy import func, or_, literal, insert, update, bindparam
 from sqlalchemy.orm import Session
 
-from db.models import User, Account, Transaction, TransactionType
+from db.models import User, Account, Transaction, TransactionType, unicode_lower
 from utils.dates import now_in_timezone
 
 logger = logging.getLogger(__name__)
 
 
+# Session.info key for per-request balances; sessions live for one handler call
+BALANCES_CACHE_KEY = "balances_cache"
+
+
+def get_total_balances(db: Session, user_id: int) -> Dict[str, Decimal]:
+    """Get total balances grouped by currency (cached on the session until accounts change)."""
+    cache = db.info.setdefault(BALANCES_CACHE_KEY, {})
+    if user_id in cache:
+        return dict(cache[user_id])
+    
+    accounts = db.query(Account.currency, Account.balance).filter(Account.user_id == user_id).all()
+    balances = defaultdict(Decimal)
+    
+    for currency, balance in accounts:
+        balances[currency] += balance
+    
+    cache[user_id] = dict(balances)
+    return dict(balances)
+
+
+def invalidate_balances_cache(db: Session) -> None:
+    """Drop cached balances after writes that change accounts or balances."""
+    db.info.pop(BALANCES_CACHE_KEY, None)
+
+
 def get_or_create_user(db: Session, tg_user_id: int, timezone: str = "Europe/London") -> User:
     """Get or create user."""
     user = db.query(User).filter(User.tg_user_id == tg_user_id).first()
@@ -26,23 +53,43 @@ def get_or_create_user(db: Session, tg_user_id: int, timezone: str = "Europe/Lon
 
 def find_account_by_name(db: Session, user_id: int, account_name: str, exact_only: bool = False) -> Optional[Account]:
     """Find account by name (exact or fuzzy match)."""
-    accounts = db.query(Account).filter(Account.user_id == user_id).all()
+    account_name_lower = account_name.lower()
+    name_lower = unicode_lower(Account.name)
+    is_exact = name_lower == account_name_lower
     
-    # Exact match first
-    for acc in accounts:
-        if acc.name.lower() == account_name.lower():
-            return acc
+    query = db.query(Account).filter(Account.user_id == user_id)
     
     if exact_only:
-        return None
-    
-    # Fuzzy match (contains)
-    account_name_lower = account_name.lower()
-    for acc in accounts:
-        if account_name_lower in acc.name.lower() or acc.name.lower() in account_name_lower:
-            return acc
-    
-    return None
+        return query.filter(is_exact).first()
+    
+    # Exact match first, then fuzzy match (contains, both directions)
+    return query.filter(
+        or_(
+            is_exact,
+            name_lower.contains(account_name_lower, autoescape=True),
+            literal(account_name_lower).contains(_escape_like(name_lower), escape="\\"),
+        )
+    ).order_by(is_exact.desc(), Account.id).first()
+
+
+def _escape_like(expr):
+    """Escape LIKE wildcards in a SQL string expression (escape character is a backslash)."""
+    for char in ("\\", "%", "_"):
+        expr = func.replace(expr, char, "\\" + char)
+    return expr
+
+
+def _get_account_with_timezone(db: Session, user_id: int, account_id: int) -> Tuple[Optional[Account], str]:
+    """Load user's account together with the user's timezone in one query."""
+    row = (
+        db.query(Account, User.timezone)
+        .join(User, User.id == Account.user_id)
+        .filter(Account.id == account_id, Account.user_id == user_id)
+        .first()
+    )
+    if not row:
+        return None, "Europe/London"
+    return row[0], row[1]
 
 
 def add_income(
@@ -60,14 +107,13 @@ def add_income(
     Add income transaction.
     Atomically increases account balance and creates transaction.
     """
-    if operation_date is None:
-        user = db.query(User).filter(User.id == user_id).first()
-        operation_date = now_in_timezone(user.timezone if user else "Europe/London")
-    
-    account = db.query(Account).filter(Account.id == account_id, Account.user_id == user_id).first()
+    account, user_timezone = _get_account_with_timezone(db, user_id, account_id)
     if not account:
         raise ValueError(f"Account {account_id} not found for user {user_id}")
     
+    if operation_date is None:
+        operation_date = now_in_timezone(user_timezone)
+    
     try:
         # Atomic transaction
         account.balance += amount
@@ -85,8 +131,8 @@ def add_income(
         )
         
         db.add(transaction)
+        invalidate_balances_cache(db)
         db.commit()
-        db.refresh(transaction)
         logger.info(f"Added income: {amount} {currency} to account {account_id}")
         return transaction
     except Exception as e:
@@ -110,14 +156,13 @@ def add_expense(
     Add expense transaction.
     Atomically decreases account balance and creates transaction.
     """
-    if operation_date is None:
-        user = db.query(User).filter(User.id == user_id).first()
-        operation_date = now_in_timezone(user.timezone if user else "Europe/London")
-    
-    account = db.query(Account).filter(Account.id == account_id, Account.user_id == user_id).first()
+    account, user_timezone = _get_account_with_timezone(db, user_id, account_id)
     if not account:
         raise ValueError(f"Account {account_id} not found for user {user_id}")
     
+    if operation_date is None:
+        operation_date = now_in_timezone(user_timezone)
+    
     if account.balance < amount:
         raise ValueError(f"Insufficient balance: {account.balance} < {amount}")
     
@@ -138,8 +183,8 @@ def add_expense(
         )
         
         db.add(transaction)
+        invalidate_balances_cache(db)
         db.commit()
-        db.refresh(transaction)
         logger.info(f"Added expense: {amount} {currency} from account {account_id}")
         return transaction
     except Exception as e:
@@ -165,18 +210,17 @@ def transfer(
     Supports cross-currency transfers with manual amount specification.
     Atomically decreases from_account, increases to_account, creates transaction.
     """
-    if operation_date is None:
-        user = db.query(User).filter(User.id == user_id).first()
-        operation_date = now_in_timezone(user.timezone if user else "Europe/London")
-    
-    from_account = db.query(Account).filter(
-        Account.id == from_account_id,
-        Account.user_id == user_id
-    ).first()
-    to_account = db.query(Account).filter(
-        Account.id == to_account_id,
-        Account.user_id == user_id
-    ).first()
+    # Both accounts (and the user's timezone) in one round trip
+    rows = (
+        db.query(Account, User.timezone)
+        .join(User, User.id == Account.user_id)
+        .filter(Account.id.in_([from_account_id, to_account_id]), Account.user_id == user_id)
+        .all()
+    )
+    accounts = {account.id: account for account, _ in rows}
+    user_timezone = rows[0][1] if rows else "Europe/London"
+    from_account = accounts.get(from_account_id)
+    to_account = accounts.get(to_account_id)
     
     if not from_account:
         raise ValueError(f"From account {from_account_id} not found")
@@ -186,13 +230,24 @@ def transfer(
     if from_account.balance < amount:
         raise ValueError(f"Insufficient balance: {from_account.balance} < {amount}")
     
+    if operation_date is None:
+        operation_date = now_in_timezone(user_timezone)
+    
     # Use to_amount for cross-currency, otherwise same amount
     credit_amount = to_amount if to_amount is not None else amount
     
     try:
-        # Atomic transaction
-        from_account.balance -= amount
-        to_account.balance += credit_amount
+        # Atomic transaction: both balance updates go out as one executemany
+        accounts_table = Account.__table__
+        db.execute(
+            update(accounts_table)
+            .where(accounts_table.c.id == bindparam("account_id"))
+            .values(balance=accounts_table.c.balance + bindparam("delta")),
+            [
+                {"account_id": from_account_id, "delta": -amount},
+                {"account_id": to_account_id, "delta": credit_amount},
+            ]
+        )
         
         transaction = Transaction(
             user_id=user_id,
@@ -206,8 +261,8 @@ def transfer(
         )
         
         db.add(transaction)
+        invalidate_balances_cache(db)
         db.commit()
-        db.refresh(transaction)
         logger.info(f"Transfer: {amount} {currency} from {from_account_id} to {to_account_id}")
         return transaction
     except Exception as e:
@@ -236,15 +291,18 @@ def create_account(
         is_default=is_first_account  # First account is default
     )
     db.add(account)
-    db.commit()
-    db.refresh(account)
+    db.flush()  # Populate account.id
     
     # Also set user.default_account_id if first account
     if is_first_account:
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            user.default_account_id = account.id
-            db.commit()
+        db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(default_account_id=account.id)
+        )
+    
+    invalidate_balances_cache(db)
+    db.commit()
     
     logger.info(f"Created account: {name} for user {user_id} (default={is_first_account})")
     return account
@@ -264,6 +322,7 @@ def delete_account(db: Session, user_id: int, account_id: int) -> bool:
         raise ValueError(f"Cannot delete account with non-zero balance: {account.balance}")
     
     db.delete(account)
+    invalidate_balances_cache(db)
     db.commit()
     logger.info(f"Deleted account: {account_id}")
     return True
@@ -286,7 +345,6 @@ def rename_account(
     
     account.name = new_name
     db.commit()
-    db.refresh(account)
     logger.info(f"Renamed account {account_id} to {new_name}")
     return account
 
@@ -315,23 +373,18 @@ def set_default_account(db: Session, user_id: int, account_id: int) -> Account:
     account.is_default = True
     user.default_account_id = account_id
     db.commit()
-    db.refresh(account)
     logger.info(f"Set default account {account_id} for user {user_id}")
     return account
 
 
-def list_user_transactions(
+def _user_transactions_query(
     db: Session,
     user_id: int,
     from_date: Optional[date] = None,
     to_date: Optional[date] = None,
-    transaction_type: Optional[str] = None,
-    limit: int = 50
-) -> List[Tuple[int, Transaction]]:
-    """
-    Get list of user transactions with row numbers.
-    Returns list of (row_number, transaction) tuples.
-    """
+    transaction_type: Optional[str] = None
+):
+    """Build user transactions query, most recent first."""
     query = db.query(Transaction).filter(Transaction.user_id == user_id)
     
     if from_date:
@@ -344,7 +397,24 @@ def list_user_transactions(
         elif transaction_type == "expense":
             query = query.filter(Transaction.type == TransactionType.EXPENSE)
     
-    transactions = query.order_by(Transaction.operation_date.desc()).limit(limit).all()
+    return query.order_by(Transaction.operation_date.desc())
+
+
+def list_user_transactions(
+    db: Session,
+    user_id: int,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    transaction_type: Optional[str] = None,
+    limit: int = 50
+) -> List[Tuple[int, Transaction]]:
+    """
+    Get list of user transactions with row numbers.
+    Returns list of (row_number, transaction) tuples.
+    """
+    transactions = _user_transactions_query(
+        db, user_id, from_date, to_date, transaction_type
+    ).limit(limit).all()
     
     # Add row numbers (1-based, most recent first)
     return [(i + 1, tx) for i, tx in enumerate(transactions)]
@@ -361,12 +431,23 @@ def get_transaction_by_row_number(
     Get transaction by row number in the current list.
     Row numbers are 1-based, most recent first.
     """
-    transactions = list_user_transactions(db, user_id, from_date, to_date, limit=100)
+    if row_number < 1:
+        return None
     
-    for num, tx in transactions:
-        if num == row_number:
-            return tx
-    return None
+    return _user_transactions_query(
+        db, user_id, from_date, to_date
+    ).offset(row_number - 1).limit(1).first()
+
+
+def _adjust_balance(db: Session, account_id: Optional[int], delta: Decimal) -> None:
+    """Add delta to account balance with a single UPDATE (no SELECT)."""
+    if account_id is None:
+        return
+    db.execute(
+        update(Account)
+        .where(Account.id == account_id)
+        .values(balance=Account.balance + delta)
+    )
 
 
 def update_transaction(
@@ -394,13 +475,9 @@ def update_transaction(
             diff = new_amount - transaction.amount
             
             if transaction.type == TransactionType.INCOME:
-                account = db.query(Account).filter(Account.id == transaction.account_id).first()
-                if account:
-                    account.balance += diff
+                _adjust_balance(db, transaction.account_id, diff)
             elif transaction.type == TransactionType.EXPENSE:
-                account = db.query(Account).filter(Account.id == transaction.account_id).first()
-                if account:
-                    account.balance -= diff  # Expense: more expense = less balance
+                _adjust_balance(db, transaction.account_id, -diff)  # Expense: more expense = less balance
             
             transaction.amount = new_amount
         
@@ -410,8 +487,8 @@ def update_transaction(
         if new_description is not None:
             transaction.description = new_description
         
+        invalidate_balances_cache(db)
         db.commit()
-        db.refresh(transaction)
         logger.info(f"Updated transaction {transaction_id}")
         return transaction
     except Exception as e:
@@ -439,22 +516,15 @@ def delete_transaction_by_id(
     try:
         # Reverse the balance change
         if transaction.type == TransactionType.INCOME:
-            account = db.query(Account).filter(Account.id == transaction.account_id).first()
-            if account:
-                account.balance -= transaction.amount
+            _adjust_balance(db, transaction.account_id, -transaction.amount)
         elif transaction.type == TransactionType.EXPENSE:
-            account = db.query(Account).filter(Account.id == transaction.account_id).first()
-            if account:
-                account.balance += transaction.amount
+            _adjust_balance(db, transaction.account_id, transaction.amount)
         elif transaction.type == TransactionType.TRANSFER:
-            from_account = db.query(Account).filter(Account.id == transaction.from_account_id).first()
-            to_account = db.query(Account).filter(Account.id == transaction.to_account_id).first()
-            if from_account:
-                from_account.balance += transaction.amount
-            if to_account:
-                to_account.balance -= transaction.amount
+            _adjust_balance(db, transaction.from_account_id, transaction.amount)
+            _adjust_balance(db, transaction.to_account_id, -transaction.amount)
         
         db.delete(transaction)
+        invalidate_balances_cache(db)
         db.commit()
         logger.info(f"Deleted transaction {transaction_id}")
         return True
@@ -470,17 +540,26 @@ def clear_user_data(db: Session, user_id: int) -> Tuple[int, int]:
     Returns (transactions_deleted, accounts_deleted).
     """
     try:
+        # Reset user's default_account_id before its account goes away
+        db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(default_account_id=None)
+        )
+        
+        # Bulk DELETEs; "fetch" also evicts deleted rows from the session, otherwise
+        # SQLite reuses their rowids and new objects collide with stale identities
         # Delete all transactions first (foreign key constraint)
-        tx_count = db.query(Transaction).filter(Transaction.user_id == user_id).delete()
+        tx_count = db.query(Transaction).filter(
+            Transaction.user_id == user_id
+        ).delete(synchronize_session="fetch")
         
         # Delete all accounts
-        acc_count = db.query(Account).filter(Account.user_id == user_id).delete()
-        
-        # Reset user's default_account_id
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            user.default_account_id = None
+        acc_count = db.query(Account).filter(
+            Account.user_id == user_id
+        ).delete(synchronize_session="fetch")
         
+        invalidate_balances_cache(db)
         db.commit()
         logger.info(f"Cleared user {user_id} data: {tx_count} transactions, {acc_count} accounts")
         return (tx_count, acc_count)
@@ -490,6 +569,17 @@ def clear_user_data(db: Session, user_id: int) -> Tuple[int, int]:
         raise
 
 
+# Rows per INSERT statement in create_transactions_bulk
+BULK_INSERT_CHUNK_SIZE = 500
+
+# Map string type to enum
+_TRANSACTION_TYPES = {
+    "income": TransactionType.INCOME,
+    "expense": TransactionType.EXPENSE,
+    "transfer": TransactionType.TRANSFER,
+}
+
+
 def create_transaction_raw(
     db: Session,
     user_id: int,
@@ -509,16 +599,10 @@ def create_transaction_raw(
     Used for importing data where balances are set separately.
     """
     if operation_date is None:
-        user = db.query(User).filter(User.id == user_id).first()
-        operation_date = now_in_timezone(user.timezone if user else "Europe/London")
+        user_timezone = db.query(User.timezone).filter(User.id == user_id).scalar()
+        operation_date = now_in_timezone(user_timezone or "Europe/London")
     
-    # Map string type to enum
-    type_map = {
-        "income": TransactionType.INCOME,
-        "expense": TransactionType.EXPENSE,
-        "transfer": TransactionType.TRANSFER,
-    }
-    tx_type = type_map.get(transaction_type.lower(), TransactionType.EXPENSE)
+    tx_type = _TRANSACTION_TYPES.get(transaction_type.lower(), TransactionType.EXPENSE)
     
     transaction = Transaction(
         user_id=user_id,
@@ -538,3 +622,47 @@ def create_transaction_raw(
     # Don't commit here - let caller handle the transaction
     return transaction
 
+
+
+def create_transactions_bulk(db: Session, user_id: int, rows: Iterable[dict]) -> int:
+    """
+    Create many transactions WITHOUT updating account balances,
+    in multi-row INSERTs of up to BULK_INSERT_CHUNK_SIZE rows.
+    Each row uses the same keys as create_transaction_raw arguments;
+    rows may be any iterable (e.g. a generator), it is consumed chunk by chunk.
+    Returns number of created transactions.
+    """
+    created = 0
+    default_date = None
+    mappings = []
+    for row in rows:
+        operation_date = row.get("operation_date")
+        if operation_date is None:
+            if default_date is None:
+                user_timezone = db.query(User.timezone).filter(User.id == user_id).scalar()
+                default_date = now_in_timezone(user_timezone or "Europe/London")
+            operation_date = default_date
+        
+        mappings.append({
+            "user_id": user_id,
+            "type": _TRANSACTION_TYPES.get(row["transaction_type"].lower(), TransactionType.EXPENSE),
+            "amount": row["amount"],
+            "currency": row["currency"],
+            "account_id": row.get("account_id"),
+            "from_account_id": row.get("from_account_id"),
+            "to_account_id": row.get("to_account_id"),
+            "category": row.get("category"),
+            "subcategory": row.get("subcategory"),
+            "description": row.get("description"),
+            "operation_date": operation_date,
+        })
+        if len(mappings) == BULK_INSERT_CHUNK_SIZE:
+            db.execute(insert(Transaction), mappings)
+            created += len(mappings)
+            mappings = []
+    
+    if mappings:
+        db.execute(insert(Transaction), mappings)
+        created += len(mappings)
+    # Don't commit here - let caller handle the transaction
+    return created
@@ -1,29 +1,29 @@
 """Reports service."""
+import io
 import logging
+import sys
 from decimal import Decimal
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from collections import defaultdict
+from functools import lru_cache
 
-from sqlalchemy import func
+from sqlalchemy import func, select, literal, union_all, bindparam, cast, String, Boolean, BigInteger
 from sqlalchemy.orm import Session
 
-from db.models import User, Account, Transaction, TransactionType
+from db.models import User, Account, Transaction, TransactionType, sum_cents
 from utils.dates import parse_period, format_date
-from utils.money import format_amount
+from utils.money import format_amount, from_cents
+from services.ledger import get_total_balances
 
 logger = logging.getLogger(__name__)
 
+# Transaction types covered by reports (module-level so the IN filter compiles once)
+REPORT_TRANSACTION_TYPES = (TransactionType.INCOME, TransactionType.EXPENSE)
 
-def get_total_balances(db: Session, user_id: int) -> Dict[str, Decimal]:
-    """Get total balances grouped by currency."""
-    accounts = db.query(Account).filter(Account.user_id == user_id).all()
-    balances = defaultdict(Decimal)
-    
-    for account in accounts:
-        balances[account.currency] += account.balance
-    
-    return dict(balances)
+# Categories listed per type and currency; the rest are rolled up into "Прочее" in SQL
+TOP_CATEGORIES = 10
+OTHER_CATEGORY = "Прочее"
 
 
 def get_report(
@@ -52,48 +52,35 @@ def get_report(
     
     start, end = parse_period(period_preset, from_date, to_date, user.timezone)
     
-    # Get totals grouped by currency
-    income_by_currency = db.query(
-        Transaction.currency,
-        func.sum(Transaction.amount).label("total")
-    ).filter(
-        Transaction.user_id == user_id,
-        Transaction.type == TransactionType.INCOME,
-        Transaction.operation_date >= start,
-        Transaction.operation_date <= end
-    ).group_by(Transaction.currency).all()
-    
-    expense_by_currency = db.query(
-        Transaction.currency,
-        func.sum(Transaction.amount).label("total")
-    ).filter(
-        Transaction.user_id == user_id,
-        Transaction.type == TransactionType.EXPENSE,
-        Transaction.operation_date >= start,
-        Transaction.operation_date <= end
-    ).group_by(Transaction.currency).all()
-    
-    income_totals = {row.currency: row.total for row in income_by_currency}
-    expense_totals = {row.currency: row.total for row in expense_by_currency}
+    # One aggregate: per-currency totals are derived from the category sums
+    income_rows = []
+    expense_rows = []
+    income_cents = defaultdict(int)
+    expense_cents = defaultdict(int)
+    for transaction_type, category, currency, total, currency_total, is_other in _get_category_totals(db, user_id, start, end):
+        # Currencies are a tiny closed set: interned keys hit the dict identity fast path
+        currency = sys.intern(currency)
+        if transaction_type == TransactionType.INCOME:
+            income_rows.append((category, currency, total, currency_total, is_other))
+            income_cents[currency] += total
+        else:
+            expense_rows.append((category, currency, total, currency_total, is_other))
+            expense_cents[currency] += total
+    income_totals = {currency: from_cents(total) for currency, total in income_cents.items()}
+    expense_totals = {currency: from_cents(total) for currency, total in expense_cents.items()}
     
     # Calculate net by currency
-    all_currencies = set(income_totals.keys()) | set(expense_totals.keys())
+    all_currencies = set(income_cents.keys()) | set(expense_cents.keys())
     net_totals = {}
     for currency in all_currencies:
-        income = income_totals.get(currency, Decimal("0.00"))
-        expense = expense_totals.get(currency, Decimal("0.00"))
-        net_totals[currency] = income - expense
+        net_totals[currency] = from_cents(income_cents.get(currency, 0) - expense_cents.get(currency, 0))
     
     # Get balances
     balances = get_total_balances(db, user_id)
     
     # Breakdown by category (grouped by currency)
-    income_by_category = _get_breakdown_by_category(
-        db, user_id, TransactionType.INCOME, start, end
-    )
-    expense_by_category = _get_breakdown_by_category(
-        db, user_id, TransactionType.EXPENSE, start, end
-    )
+    income_by_category = _build_category_breakdown(income_rows)
+    expense_by_category = _build_category_breakdown(expense_rows)
     
     return {
         "totals": {
@@ -108,120 +95,191 @@ def get_report(
     }
 
 
-def _get_breakdown_by_category(
+def _get_category_totals(
     db: Session,
     user_id: int,
-    transaction_type: TransactionType,
     start: datetime,
     end: datetime
-) -> List[Dict]:
+) -> List[Tuple]:
     """
-    Get breakdown by category, grouped by currency.
-    Returns list of {category, amount, pct, currency}
+    Get (type, category, currency, total, currency_total, is_other) sums in integer cents for
+    income and expenses in the period. currency_total is the whole type/currency partition.
+    Only the top categories per type and currency are returned; the rest come back as one
+    is_other row per type and currency, so the totals still add up.
     """
-    transactions = db.query(
+    return db.execute(
+        _category_totals_statement(),
+        {"user_id": user_id, "start": start, "end": end}
+    ).all()
+
+
+@lru_cache(maxsize=None)
+def _category_totals_statement():
+    """Build the ranked category aggregate once; calls only bind user_id/start/end."""
+    total = sum_cents()
+    ranked = select(
+        Transaction.type,
         Transaction.category,
         Transaction.currency,
-        func.sum(Transaction.amount).label("total")
-    ).filter(
-        Transaction.user_id == user_id,
-        Transaction.type == transaction_type,
-        Transaction.operation_date >= start,
-        Transaction.operation_date <= end
-    ).group_by(Transaction.category, Transaction.currency).all()
+        total.label("total"),
+        cast(func.sum(total).over(
+            partition_by=(Transaction.type, Transaction.currency)
+        ), BigInteger).label("currency_total"),
+        func.row_number().over(
+            partition_by=(Transaction.type, Transaction.currency),
+            order_by=(total.desc(), Transaction.category)
+        ).label("rank")
+    ).where(
+        Transaction.user_id == bindparam("user_id"),
+        Transaction.type.in_(REPORT_TRANSACTION_TYPES),
+        Transaction.operation_date >= bindparam("start"),
+        Transaction.operation_date <= bindparam("end")
+    ).group_by(Transaction.type, Transaction.category, Transaction.currency).cte("ranked")
+    # A CTE referenced by both branches below: Postgres 12+ materializes it (runs the
+    # aggregate once) instead of inlining it into each side of the UNION ALL
     
-    # Group by currency
-    by_currency = defaultdict(list)
-    currency_totals = defaultdict(Decimal)
-    
-    for category, currency, total in transactions:
-        category_name = category if category else "Без категории"
-        by_currency[currency].append({
-            "category": category_name,
-            "amount": total,
-            "currency": currency
-        })
-        currency_totals[currency] += total
-    
-    # Calculate percentages and flatten
-    result = []
-    for currency, items in by_currency.items():
-        total_for_currency = currency_totals[currency]
-        for item in items:
-            pct = float((item["amount"] / total_for_currency * 100)) if total_for_currency > 0 else 0.0
-            item["pct"] = round(pct, 1)
-            result.append(item)
-    
-    # Sort by amount descending
-    result.sort(key=lambda x: x["amount"], reverse=True)
+    top = select(
+        ranked.c.type,
+        ranked.c.category,
+        ranked.c.currency,
+        ranked.c.total,
+        ranked.c.currency_total,
+        literal(False, Boolean).label("is_other")
+    ).where(ranked.c.rank <= TOP_CATEGORIES)
+    
+    other = select(
+        ranked.c.type,
+        literal(OTHER_CATEGORY, String),
+        ranked.c.currency,
+        sum_cents(ranked.c.total),
+        func.max(ranked.c.currency_total),
+        literal(True, Boolean)
+    ).where(ranked.c.rank > TOP_CATEGORIES).group_by(ranked.c.type, ranked.c.currency)
+    
+    return union_all(top, other).order_by("category", "currency")
+
+
+def _build_category_breakdown(rows: List[Tuple]) -> List[Dict]:
+    """Turn (category, currency, cents, currency_cents, is_other) rows into a sorted breakdown with percentages."""
+    result = [
+        {
+            "category": category if category else "Без категории",
+            "amount": from_cents(total),
+            "currency": currency,
+            "other": is_other,
+            "pct": round(total * 100 / currency_total, 1) if currency_total > 0 else 0.0
+        }
+        for category, currency, total, currency_total, is_other in rows
+    ]
+    
+    # Sort by amount descending, rolled-up "Прочее" rows last
+    result.sort(key=lambda x: (x["other"], -x["amount"]))
     
     return result
 
 
 def format_report_text(report: Dict, user_timezone: str = "Europe/London") -> str:
     """Format report as text message."""
+    return _format_report(*_canonical_report(report))
+
+
+def _canonical_report(report: Dict) -> Tuple:
+    """Hashable snapshot of a report: the formatter's cache key and its input."""
     period = report["period"]
-    start_str = format_date(period["from"])
-    end_str = format_date(period["to"])
+    totals = report["totals"]
+    return (
+        period["from"],
+        period["to"],
+        tuple(sorted(totals["income"].items())),
+        tuple(sorted(totals["expense"].items())),
+        tuple(sorted(totals["net"].items())),
+        tuple(sorted(report["balances"].items())),
+        _canonical_breakdown(report["breakdown_income_by_category"]),
+        _canonical_breakdown(report["breakdown_expense_by_category"]),
+    )
+
+
+def _canonical_breakdown(breakdown: List[Dict]) -> Tuple:
+    """Breakdown items as (category, amount, pct, currency, other) tuples."""
+    return tuple(
+        (item["category"], item["amount"], item["pct"], item["currency"], item.get("other", False))
+        for item in breakdown
+    )
+
+
+@lru_cache(maxsize=256)
+def _format_report(
+    period_from,
+    period_to,
+    income_totals: Tuple,
+    expense_totals: Tuple,
+    net_totals: Tuple,
+    balances: Tuple,
+    income_breakdown: Tuple,
+    expense_breakdown: Tuple
+) -> str:
+    """Render a canonical report; repeated views of the same report hit the cache."""
+    start_str = format_date(period_from)
+    end_str = format_date(period_to)
+    
+    # Lines go straight into one buffer; the separator is written before each line
+    # so the text matches a "\n".join() of the same lines
+    buf = io.StringIO()
+    write = buf.write
+    
+    def line(text: str = "") -> None:
+        write("\n")
+        write(text)
     
-    lines = [f"📊 Отчёт за {start_str}–{end_str}:\n"]
+    write(f"📊 Отчёт за {start_str}–{end_str}:\n")
     
     # Totals (grouped by currency)
-    totals = report["totals"]
-    all_currencies = set(totals['income'].keys()) | set(totals['expense'].keys())
+    income_totals = dict(income_totals)
+    expense_totals = dict(expense_totals)
+    net_totals = dict(net_totals)
+    # Sorted once; breakdown currencies are always a subset of the totals' currencies
+    currencies = sorted({*income_totals, *expense_totals})
     
-    for currency in sorted(all_currencies):
-        income = totals['income'].get(currency, Decimal("0.00"))
-        expense = totals['expense'].get(currency, Decimal("0.00"))
-        net = totals['net'].get(currency, Decimal("0.00"))
+    for currency in currencies:
+        income = income_totals.get(currency, Decimal("0.00"))
+        expense = expense_totals.get(currency, Decimal("0.00"))
+        net = net_totals.get(currency, Decimal("0.00"))
         
         if income > 0 or expense > 0:
-            lines.append(f"💰 Доходы ({currency}): {format_amount(income, currency)}")
-            lines.append(f"💸 Расходы ({currency}): {format_amount(expense, currency)}")
-            lines.append(f"📈 Сальдо ({currency}): {format_amount(net, currency)}\n")
+            line(f"💰 Доходы ({currency}): {format_amount(income, currency)}")
+            line(f"💸 Расходы ({currency}): {format_amount(expense, currency)}")
+            line(f"📈 Сальдо ({currency}): {format_amount(net, currency)}\n")
     
     # Balances
-    balances = report["balances"]
-    lines.append("💳 Баланс сейчас (все счета):")
-    for currency, amount in sorted(balances.items()):
-        lines.append(f"  • {currency}: {format_amount(amount, currency)}")
-    lines.append("")
-    
-    # Income breakdown
-    income_breakdown = report["breakdown_income_by_category"]
-    if income_breakdown:
-        # Group by currency
-        by_currency = defaultdict(list)
-        for item in income_breakdown:
-            by_currency[item["currency"]].append(item)
-        
-        for currency, items in sorted(by_currency.items()):
-            lines.append(f"📥 Откуда пришли (доходы, {currency}):")
-            for i, item in enumerate(items[:10], 1):  # Top 10
-                lines.append(f"  {i}. {item['category']} — {format_amount(item['amount'], currency)} ({item['pct']}%)")
-            if len(items) > 10:
-                other = sum(item["amount"] for item in items[10:])
-                other_pct = sum(item["pct"] for item in items[10:])
-                lines.append(f"  ... Прочее — {format_amount(other, currency)} ({other_pct:.1f}%)")
-            lines.append("")
-    
-    # Expense breakdown
-    expense_breakdown = report["breakdown_expense_by_category"]
-    if expense_breakdown:
-        # Group by currency
-        by_currency = defaultdict(list)
-        for item in expense_breakdown:
-            by_currency[item["currency"]].append(item)
-        
-        for currency, items in sorted(by_currency.items()):
-            lines.append(f"📤 Куда ушли (расходы, {currency}):")
-            for i, item in enumerate(items[:10], 1):  # Top 10
-                lines.append(f"  {i}. {item['category']} — {format_amount(item['amount'], currency)} ({item['pct']}%)")
-            if len(items) > 10:
-                other = sum(item["amount"] for item in items[10:])
-                other_pct = sum(item["pct"] for item in items[10:])
-                lines.append(f"  ... Прочее — {format_amount(other, currency)} ({other_pct:.1f}%)")
-            lines.append("")
-    
-    return "\n".join(lines)
+    line("💳 Баланс сейчас (все счета):")
+    for currency, amount in balances:
+        line(f"  • {currency}: {format_amount(amount, currency)}")
+    line()
+    
+    _append_breakdown_lines(line, "📥 Откуда пришли (доходы, {currency}):", income_breakdown, currencies)
+    _append_breakdown_lines(line, "📤 Куда ушли (расходы, {currency}):", expense_breakdown, currencies)
+    
+    return buf.getvalue()
 
+
+def _append_breakdown_lines(line: Callable[..., None], title: str, breakdown: Tuple, currencies: List[str]) -> None:
+    """Write the top categories per currency, followed by the rolled-up "Прочее" row."""
+    if not breakdown:
+        return
+    
+    # Group by currency
+    by_currency = defaultdict(list)
+    for item in breakdown:
+        by_currency[item[3]].append(item)
+    
+    for currency in currencies:
+        items = by_currency.get(currency)
+        if not items:
+            continue
+        line(title.format(currency=currency))
+        top = [item for item in items if not item[4]]
+        for i, (category, amount, pct, _, _) in enumerate(top, 1):
+            line(f"  {i}. {category} — {format_amount(amount, currency)} ({pct}%)")
+        for _, amount, pct, _, _ in (item for item in items if item[4]):
+            line(f"  ... {OTHER_CATEGORY} — {format_amount(amount, currency)} ({pct:.1f}%)")
+        line()
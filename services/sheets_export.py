@@ -8,25 +8,84 @@ Design:
 from __future__ import annotations
 
 import logging
-from decimal import Decimal
+import sys
 from datetime import datetime
 from collections import defaultdict
-from typing import List, Tuple
-from calendar import monthrange
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select, bindparam, text, column, BigInteger, DateTime
 
-from db.models import User, Account, Transaction, TransactionType
+from db.models import User, Account, Transaction, TransactionType, sum_cents
 
 logger = logging.getLogger(__name__)
 
+# "Тип" column labels; transfers are exported as expenses
+TRANSACTION_TYPE_LABELS = {
+    TransactionType.INCOME: "доход",
+    TransactionType.EXPENSE: "расход",
+    TransactionType.TRANSFER: "расход",
+}
+
+# Columns of exported transaction rows (plain tuples: the export never needs ORM instances)
+_EXPORT_COLUMNS = (
+    Transaction.operation_date,
+    Transaction.type,
+    Transaction.amount,
+    Transaction.currency,
+    Transaction.account_id,
+    Transaction.category,
+    Transaction.description,
+)
+
+# Monthly summary aggregate as plain SQL: scalar rows only, no ORM query machinery.
+# Enum columns are stored by member name; amounts are summed as integer cents
+# (cast back to BIGINT: Postgres returns numeric for SUM of bigint).
+MONTH_CATEGORY_TOTALS_SQL = text("""
+    SELECT type, category, currency, CAST(SUM(CAST(ROUND(amount * 100) AS BIGINT)) AS BIGINT) AS cents
+    FROM transactions
+    WHERE user_id = :user_id
+      AND operation_date >= :start
+      AND operation_date < :end
+      AND type IN ('INCOME', 'EXPENSE')
+    GROUP BY type, category, currency
+""").bindparams(
+    # Typed so dates are rendered the same way the DateTime column stores them
+    bindparam("start", type_=DateTime),
+    bindparam("end", type_=DateTime),
+).columns(
+    Transaction.type,
+    Transaction.category,
+    Transaction.currency,
+    column("cents", BigInteger),
+)
+
+
+# The same aggregate for all months at once, grouped by calendar month (one query per sync)
+_ALL_MONTHS_YEAR = func.extract("year", Transaction.operation_date)
+_ALL_MONTHS_MONTH = func.extract("month", Transaction.operation_date)
+ALL_MONTHS_CATEGORY_TOTALS_STMT = select(
+    _ALL_MONTHS_YEAR,
+    _ALL_MONTHS_MONTH,
+    Transaction.type,
+    Transaction.category,
+    Transaction.currency,
+    sum_cents(),
+).where(
+    Transaction.user_id == bindparam("user_id"),
+    Transaction.type.in_((TransactionType.INCOME, TransactionType.EXPENSE)),
+).group_by(
+    _ALL_MONTHS_YEAR, _ALL_MONTHS_MONTH, Transaction.type, Transaction.category, Transaction.currency
+)
+
 
 def build_balances_sheet_title() -> str:
     """Sheet title for account balances."""
     return "Балансы"
 
 
+@lru_cache(maxsize=256)
 def build_month_sheet_title(year: int, month: int) -> str:
     """Sheet title for monthly transactions (YYYY-MM format)."""
     return f"{year:04d}-{month:02d}"
@@ -67,142 +126,192 @@ def build_balances_export(db: Session, user_id: int) -> List[List[object]]:
 
 
 def build_month_transactions_export(
-    db: Session, user_id: int, year: int, month: int
-) -> List[List[object]]:
+    db: Session,
+    user_id: int,
+    year: int,
+    month: int,
+    account_names: Optional[Dict[int, str]] = None,
+    category_totals: Optional[Iterable[Tuple[TransactionType, str, str, int]]] = None,
+) -> Iterator[List[object]]:
     """Build monthly transactions sheet data with summary.
     
+    Rows are yielded one by one: totals come from an aggregate query, so the
+    listing itself is streamed from the cursor and never held in memory.
+    Exporting many months, pass account_names (get_account_names) and this month's
+    category_totals (get_month_category_totals) to skip the per-month queries.
+    
     Format:
     Дата | Тип | Сумма | Валюта | Счет | Категория | Описание
     """
     start_date = datetime(year, month, 1)
-    last_day = monthrange(year, month)[1]
-    end_date = datetime(year, month, last_day, 23, 59, 59)
+    end_date = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    if account_names is None:
+        account_names = get_account_names(db, user_id)
+    
+    if category_totals is None:
+        category_totals = db.execute(
+            MONTH_CATEGORY_TOTALS_SQL,
+            {"user_id": user_id, "start": start_date, "end": end_date}
+        ).all()
     
+    # Plain column rows streamed in batches
     transactions = (
-        db.query(Transaction)
+        db.query(*_EXPORT_COLUMNS)
         .filter(
             Transaction.user_id == user_id,
             Transaction.operation_date >= start_date,
-            Transaction.operation_date <= end_date
+            Transaction.operation_date < end_date
         )
         .order_by(Transaction.operation_date.desc())
-        .all()
+        .yield_per(1000)
     )
     
-    values = []
-    
+    yield from _month_export_rows(year, month, category_totals, transactions, account_names)
+
+
+def get_account_names(db: Session, user_id: int) -> Dict[int, str]:
+    """Account id -> name for the rows, fetched once instead of per transaction."""
+    return dict(
+        db.query(Account.id, Account.name).filter(Account.user_id == user_id).all()
+    )
+
+
+def get_month_category_totals(
+    db: Session, user_id: int
+) -> Dict[Tuple[int, int], List[Tuple[TransactionType, str, str, int]]]:
+    """Monthly (type, category, currency, cents) totals of every month in one query.
+
+    Returns {(year, month): totals} for build_month_transactions_export(category_totals=...).
+    """
+    totals = defaultdict(list)
+    for year, month, tx_type, category, currency, cents in db.execute(
+        ALL_MONTHS_CATEGORY_TOTALS_STMT, {"user_id": user_id}
+    ):
+        # EXTRACT returns numeric on Postgres
+        totals[(int(year), int(month))].append((tx_type, category, currency, cents))
+    return dict(totals)
+
+
+def _month_export_rows(
+    year: int,
+    month: int,
+    category_totals: Iterable[Tuple[TransactionType, str, str, int]],
+    transactions: Iterable[tuple],
+    account_names: Dict[int, str],
+) -> Iterator[List[object]]:
+    """Yield monthly sheet rows from (type, category, currency, cents) totals and
+    transaction rows of _EXPORT_COLUMNS (most recent first)."""
     # Compact header
-    values.append([f"ОПЕРАЦИИ ЗА {year}-{month:02d} — можно редактировать ВСЕ и добавлять строки. Импорт: /sheets_import", "", "", "", "", "", "", "", "ИТОГИ"])
-    values.append([""])
+    yield [f"ОПЕРАЦИИ ЗА {year}-{month:02d} — можно редактировать ВСЕ и добавлять строки. Импорт: /sheets_import", "", "", "", "", "", "", "", "ИТОГИ"]
+    yield [""]
     
-    # Calculate totals by currency and category FIRST
-    income_by_currency = defaultdict(Decimal)
-    expense_by_currency = defaultdict(Decimal)
-    income_by_category = defaultdict(lambda: defaultdict(Decimal))
-    expense_by_category = defaultdict(lambda: defaultdict(Decimal))
-    
-    for tx in transactions:
-        if tx.type == TransactionType.INCOME:
-            income_by_currency[tx.currency] += tx.amount
-            category = tx.category or "Без категории"
-            income_by_category[category][tx.currency] += tx.amount
-        elif tx.type == TransactionType.EXPENSE:
-            expense_by_currency[tx.currency] += tx.amount
-            category = tx.category or "Без категории"
-            expense_by_category[category][tx.currency] += tx.amount
+    # Totals by currency and category FIRST (before streaming rows)
+    # Sums are integer cents; converted to floats only when written to the sheet
+    income_by_currency = defaultdict(int)
+    expense_by_currency = defaultdict(int)
+    income_by_category = defaultdict(lambda: defaultdict(int))
+    expense_by_category = defaultdict(lambda: defaultdict(int))
+    expense_category_totals = defaultdict(int)  # All currencies, for ordering the breakdown
+    
+    INCOME = TransactionType.INCOME
+    for tx_type, category, currency, amount in category_totals:
+        # Currencies are a tiny closed set: interned keys hit the dict identity fast path
+        currency = sys.intern(currency)
+        if tx_type == INCOME:
+            income_by_currency[currency] += amount
+            income_by_category[category or "Без категории"][currency] += amount
+        else:
+            expense_by_currency[currency] += amount
+            expense_by_category[category or "Без категории"][currency] += amount
+            expense_category_totals[category or "Без категории"] += amount
     
     # Build header with summary columns on the right
-    values.append(["Дата", "Тип", "Сумма", "Валюта", "Счет", "Категория", "Описание", "", "📊 ИТОГИ ЗА МЕСЯЦ"])
+    yield ["Дата", "Тип", "Сумма", "Валюта", "Счет", "Категория", "Описание", "", "📊 ИТОГИ ЗА МЕСЯЦ"]
     
     # Build rows with summary in columns I-J (just label and value)
     summary_rows = []
     all_currencies = sorted(set(income_by_currency.keys()) | set(expense_by_currency.keys()))
     for currency in all_currencies:
-        income = income_by_currency.get(currency, Decimal("0"))
-        expense = expense_by_currency.get(currency, Decimal("0"))
+        income = income_by_currency.get(currency, 0)
+        expense = expense_by_currency.get(currency, 0)
         net = income - expense
-        summary_rows.append([f"💰 Доходы ({currency}):", float(income)])
-        summary_rows.append([f"💸 Расходы ({currency}):", float(expense)])
-        summary_rows.append([f"📈 Сальдо ({currency}):", float(net)])
+        summary_rows.append([f"💰 Доходы ({currency}):", income / 100])
+        summary_rows.append([f"💸 Расходы ({currency}):", expense / 100])
+        summary_rows.append([f"📈 Сальдо ({currency}):", net / 100])
         summary_rows.append(["", ""])
     
     # Add category breakdown to summary
     if expense_by_category:
         summary_rows.append(["📂 По категориям:", ""])
-        for category, currencies in sorted(expense_by_category.items(), 
-                                          key=lambda x: sum(x[1].values()), reverse=True):
-            for currency, amount in sorted(currencies.items()):
-                summary_rows.append([f"  {category}", float(amount)])
+        # Largest first; equal totals by name so the order does not depend on row order
+        for category in sorted(expense_by_category, key=lambda c: (-expense_category_totals[c], c)):
+            for currency, amount in sorted(expense_by_category[category].items()):
+                summary_rows.append([f"  {category}", amount / 100])
     
-    if not transactions:
-        values.append([f"Нет операций за {year}-{month:02d}", "", "", "", "", "", ""])
-    else:
-        row_idx = 0
-        for tx in transactions:
-            tx_type = "доход" if tx.type == TransactionType.INCOME else "расход"
-            # Include time (MSK timezone) in export
-            date_str = tx.operation_date.strftime("%d.%m.%Y %H:%M")
-            
-            account_name = "—"
-            if tx.account_id:
-                acc = db.query(Account).filter(Account.id == tx.account_id).first()
-                if acc:
-                    account_name = acc.name
-            
-            category = tx.category or "Без категории"
-            description = tx.description or "—"
-            
-            # Add transaction row + summary column if available
-            tx_row = [
-                date_str,
-                tx_type,
-                float(tx.amount),
-                tx.currency,
-                account_name,
-                category,
-                description,
-                ""  # Empty column separator
-            ]
-            
-            # Add summary data if available for this row
-            if row_idx < len(summary_rows):
-                tx_row.extend(summary_rows[row_idx])
-            
-            values.append(tx_row)
-            row_idx += 1
+    row_idx = 0
+    type_labels = TRANSACTION_TYPE_LABELS
+    intern = sys.intern
+    for operation_date, tx_type, amount, currency, account_id, category, description in transactions:
+        # Add transaction row + summary column if available
+        tx_row = [
+            # Include time (MSK timezone) in export; f-string is much cheaper than strftime
+            f"{operation_date.day:02d}.{operation_date.month:02d}.{operation_date.year:04d} "
+            f"{operation_date.hour:02d}:{operation_date.minute:02d}",
+            type_labels.get(tx_type, "расход"),
+            float(amount),
+            intern(currency),  # One shared str per currency across all rows
+            account_names.get(account_id, "—"),
+            category or "Без категории",
+            description or "—",
+            ""  # Empty column separator
+        ]
+        
+        # Add summary data if available for this row
+        if row_idx < len(summary_rows):
+            tx_row.extend(summary_rows[row_idx])
         
-        # Add remaining summary rows if there are more summary lines than transactions
-        while row_idx < len(summary_rows):
-            values.append(["", "", "", "", "", "", "", ""] + summary_rows[row_idx])
-            row_idx += 1
+        yield tx_row
+        row_idx += 1
     
-    return values
+    if row_idx == 0:
+        yield [f"Нет операций за {year}-{month:02d}", "", "", "", "", "", ""]
+        return
+    
+    # Add remaining summary rows if there are more summary lines than transactions
+    while row_idx < len(summary_rows):
+        yield ["", "", "", "", "", "", "", ""] + summary_rows[row_idx]
+        row_idx += 1
 
 
 def get_user_transaction_months(db: Session, user_id: int, limit: int = None) -> List[Tuple[int, int]]:
     """Get list of (year, month) tuples for user's transactions (most recent first).
     
+    One grouped query over the user's rows of the (user_id, operation_date) index.
+    
     Args:
         db: Database session
         user_id: User ID
         limit: Optional limit on number of months (None = all months)
     """
-    query = (
-        db.query(
-            func.extract('year', Transaction.operation_date).label('year'),
-            func.extract('month', Transaction.operation_date).label('month')
-        )
-        .filter(Transaction.user_id == user_id)
-        .distinct()
-        .order_by(
-            func.extract('year', Transaction.operation_date).desc(),
-            func.extract('month', Transaction.operation_date).desc()
-        )
+    rows = db.execute(
+        _transaction_months_statement(limit is not None),
+        {"user_id": user_id, "limit": limit}
     )
-    
-    if limit:
-        query = query.limit(limit)
-    
-    result = query.all()
-    
-    return [(int(row.year), int(row.month)) for row in result]
+    # EXTRACT returns numeric on Postgres
+    return [(int(year), int(month)) for year, month in rows]
+
+
+@lru_cache(maxsize=None)
+def _transaction_months_statement(limited: bool):
+    """Distinct (year, month) of a user's transactions, newest first; built once per shape."""
+    year = func.extract("year", Transaction.operation_date)
+    month = func.extract("month", Transaction.operation_date)
+    stmt = (
+        select(year, month)
+        .where(Transaction.user_id == bindparam("user_id"))
+        .group_by(year, month)
+        .order_by(year.desc(), month.desc())
+    )
+    if limited:
+        stmt = stmt.limit(bindparam("limit"))
+    return stmt
@@ -3,63 +3,59 @@
 from __future__ import annotations
 
 import logging
-from typing import Optional
+from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
+# Column widths in pixels, left to right; None keeps the sheet default
+BALANCES_COLUMN_WIDTHS = [
+    200,  # Account
+    80,   # Currency
+    120,  # Balance
+    100,  # Default
+]
 
-def format_balances_sheet(service, spreadsheet_id: str, sheet_id: int) -> None:
-    """Apply formatting to Balances sheet."""
-    requests = [
-        # Set column widths
-        {
-            "updateDimensionProperties": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "COLUMNS",
-                    "startIndex": 0,
-                    "endIndex": 1
-                },
-                "properties": {"pixelSize": 200},
-                "fields": "pixelSize"
-            }
-        },
-        {
-            "updateDimensionProperties": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "COLUMNS",
-                    "startIndex": 1,
-                    "endIndex": 2
-                },
-                "properties": {"pixelSize": 80},
-                "fields": "pixelSize"
-            }
-        },
-        {
-            "updateDimensionProperties": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "COLUMNS",
-                    "startIndex": 2,
-                    "endIndex": 3
-                },
-                "properties": {"pixelSize": 120},
-                "fields": "pixelSize"
-            }
-        },
-        {
-            "updateDimensionProperties": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "COLUMNS",
-                    "startIndex": 3,
-                    "endIndex": 4
-                },
-                "properties": {"pixelSize": 100},
-                "fields": "pixelSize"
-            }
-        },
+MONTH_COLUMN_WIDTHS = [
+    100,   # Date
+    80,    # Type
+    100,   # Amount
+    70,    # Currency
+    120,   # Account
+    150,   # Category
+    250,   # Description
+    None,  # Separator
+    200,   # Summary label
+    120,   # Summary value
+]
+
+
+def _column_width_requests(sheet_id: int, widths: List[Optional[int]]) -> List[dict]:
+    """Build updateDimensionProperties requests, one per run of equal adjacent widths."""
+    requests = []
+    start = 0
+    for index in range(1, len(widths) + 1):
+        if index < len(widths) and widths[index] == widths[start]:
+            continue
+        if widths[start] is not None:
+            requests.append({
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "COLUMNS",
+                        "startIndex": start,
+                        "endIndex": index
+                    },
+                    "properties": {"pixelSize": widths[start]},
+                    "fields": "pixelSize"
+                }
+            })
+        start = index
+    return requests
+
+
+def balances_sheet_format_requests(sheet_id: int) -> List[dict]:
+    """Build batchUpdate requests that format Balances sheet."""
+    return _column_width_requests(sheet_id, BALANCES_COLUMN_WIDTHS) + [
         # Make header row bold
         {
             "repeatCell": {
@@ -90,128 +86,11 @@ def format_balances_sheet(service, spreadsheet_id: str, sheet_id: int) -> None:
             }
         }
     ]
-    
-    try:
-        service.spreadsheets().batchUpdate(
-            spreadsheetId=spreadsheet_id,
-            body={"requests": requests}
-        ).execute()
-    except Exception as e:
-        logger.warning(f"Failed to format Balances sheet: {e}")
 
 
-def format_month_sheet(service, spreadsheet_id: str, sheet_id: int) -> None:
-    """Apply formatting to monthly transactions sheet."""
-    requests = [
-        # Set column widths
-        {
-            "updateDimensionProperties": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "COLUMNS",
-                    "startIndex": 0,
-                    "endIndex": 1
-                },
-                "properties": {"pixelSize": 100},  # Date
-                "fields": "pixelSize"
-            }
-        },
-        {
-            "updateDimensionProperties": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "COLUMNS",
-                    "startIndex": 1,
-                    "endIndex": 2
-                },
-                "properties": {"pixelSize": 80},  # Type
-                "fields": "pixelSize"
-            }
-        },
-        {
-            "updateDimensionProperties": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "COLUMNS",
-                    "startIndex": 2,
-                    "endIndex": 3
-                },
-                "properties": {"pixelSize": 100},  # Amount
-                "fields": "pixelSize"
-            }
-        },
-        {
-            "updateDimensionProperties": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "COLUMNS",
-                    "startIndex": 3,
-                    "endIndex": 4
-                },
-                "properties": {"pixelSize": 70},  # Currency
-                "fields": "pixelSize"
-            }
-        },
-        {
-            "updateDimensionProperties": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "COLUMNS",
-                    "startIndex": 4,
-                    "endIndex": 5
-                },
-                "properties": {"pixelSize": 120},  # Account
-                "fields": "pixelSize"
-            }
-        },
-        {
-            "updateDimensionProperties": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "COLUMNS",
-                    "startIndex": 5,
-                    "endIndex": 6
-                },
-                "properties": {"pixelSize": 150},  # Category
-                "fields": "pixelSize"
-            }
-        },
-        {
-            "updateDimensionProperties": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "COLUMNS",
-                    "startIndex": 6,
-                    "endIndex": 7
-                },
-                "properties": {"pixelSize": 250},  # Description
-                "fields": "pixelSize"
-            }
-        },
-        {
-            "updateDimensionProperties": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "COLUMNS",
-                    "startIndex": 8,
-                    "endIndex": 9
-                },
-                "properties": {"pixelSize": 200},  # Summary label
-                "fields": "pixelSize"
-            }
-        },
-        {
-            "updateDimensionProperties": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "COLUMNS",
-                    "startIndex": 9,
-                    "endIndex": 10
-                },
-                "properties": {"pixelSize": 120},  # Summary value
-                "fields": "pixelSize"
-            }
-        },
+def month_sheet_format_requests(sheet_id: int) -> List[dict]:
+    """Build batchUpdate requests that format monthly transactions sheet."""
+    return _column_width_requests(sheet_id, MONTH_COLUMN_WIDTHS) + [
         # Make header row bold
         {
             "repeatCell": {
@@ -261,12 +140,17 @@ def format_month_sheet(service, spreadsheet_id: str, sheet_id: int) -> None:
             }
         }
     ]
-    
+
+
+def format_sheets(service, spreadsheet_id: str, requests: List[dict]) -> None:
+    """Apply formatting requests of several sheets with one batchUpdate call."""
+    if not requests:
+        return
     try:
         service.spreadsheets().batchUpdate(
             spreadsheetId=spreadsheet_id,
             body={"requests": requests}
         ).execute()
     except Exception as e:
-        logger.warning(f"Failed to format month sheet: {e}")
+        logger.warning(f"Failed to format sheets: {e}")
 
@@ -3,16 +3,34 @@
 from __future__ import annotations
 
 import logging
+import re
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from functools import lru_cache
+from itertools import islice
+from typing import Iterator, Optional
 
 from sqlalchemy.orm import Session
 
-from services.google_sheets_client import read_sheet_values
+from services.google_sheets_client import read_sheet_values, read_sheets_values_batch
 
 logger = logging.getLogger(__name__)
 
+_DEC_ZERO = Decimal("0")
+
+# Placeholder rows of an empty "Балансы" sheet
+_ACCOUNT_PLACEHOLDER_ROWS = frozenset({"Нет счетов", "(no accounts)"})
+# Placeholder and separator rows of a monthly sheet
+_NO_OPERATIONS_RE = re.compile("Нет операций|═")
+# Summary rows (they now appear in columns I-J, but might leak into parsing)
+_SUMMARY_MARKERS_RE = re.compile("ИТОГО|💰|💸|📈|📂")
+
+_INCOME_TYPES = frozenset({"доход", "income", "+", "💰"})
+_EXPENSE_TYPES = frozenset({"расход", "expense", "-", "💸"})
+
+# Amount cleanup in one pass: drop spaces and currency symbols, decimal comma -> dot
+_AMOUNT_TRANS = str.maketrans({" ": "", ",": ".", "₽": "", "$": "", "€": ""})
+
 
 class ImportedTransaction:
     """Represents a transaction parsed from Sheets."""
@@ -46,7 +64,7 @@ class ImportedTransaction:
 class ImportedAccount:
     """Represents an account parsed from Sheets."""
 
-    def __init__(self, name: str, currency: str, initial_balance: Decimal = Decimal("0"), is_default: bool = False):
+    def __init__(self, name: str, currency: str, initial_balance: Decimal = _DEC_ZERO, is_default: bool = False):
         self.name = name
         self.currency = currency
         self.initial_balance = initial_balance
@@ -56,41 +74,73 @@ class ImportedAccount:
         return f"ImportedAccount({self.name}, {self.currency}, balance={self.initial_balance}, default={self.is_default})"
 
 
-def parse_accounts_from_balances_sheet(spreadsheet_id: str) -> list[ImportedAccount]:
-    """Read and parse accounts from "Балансы" sheet.
+def parse_spreadsheet(
+    spreadsheet_id: str, db: Session, user_id: int
+) -> tuple[list[ImportedAccount], list[ImportedTransaction]]:
+    """Read "Балансы" and all monthly sheets with a single batch request and parse them.
 
-    Expected format:
-    Счет | Валюта | Баланс | Основной
+    Expected formats:
+    - "Балансы": Счет | Валюта | Баланс | Основной (balance is ignored)
+    - monthly sheets (YYYY-MM): Дата | Тип | Сумма | Валюта | Счет | Категория | Описание
 
-    Returns list of ImportedAccount objects (balance is ignored).
+    Returns (accounts, transactions).
     """
     from services.sheets_export import build_balances_sheet_title
     
-    sheet_title = build_balances_sheet_title()
+    balances_title = build_balances_sheet_title()
+    month_titles = _month_sheet_titles(db, user_id)
+    sheets = _read_sheets(spreadsheet_id, [balances_title] + month_titles)
     
+    accounts = _parse_accounts_values(sheets.get(balances_title, []))
+    # A list, not an iterator: the import preview counts the rows and stores all of
+    # them in the pending action payload; the confirm step inserts them later
+    transactions = [tx for title in month_titles for tx in _iter_month_values(sheets.get(title, []))]
+    return accounts, transactions
+
+
+def _month_sheet_titles(db: Session, user_id: int) -> list[str]:
+    """Titles of the monthly sheets to import (months that have transactions)."""
+    from services.sheets_export import get_user_transaction_months, build_month_sheet_title
+    
+    return [build_month_sheet_title(year, month) for year, month in get_user_transaction_months(db, user_id)]
+
+
+def _read_sheets(spreadsheet_id: str, sheet_titles: list[str]) -> dict[str, list[list]]:
+    """Read sheets in one batch request; fall back to per-sheet reads if it fails.
+
+    A batch read fails as a whole when any sheet is missing, while a missing
+    sheet should only skip that sheet.
+    """
     try:
-        values = read_sheet_values(spreadsheet_id, sheet_title)
+        return read_sheets_values_batch(spreadsheet_id, sheet_titles)
     except Exception as e:
-        logger.warning(f"Failed to read {sheet_title} sheet: {e}")
-        return []
+        logger.warning(f"Batch read failed, reading sheets one by one: {e}")
     
+    sheets = {}
+    for sheet_title in sheet_titles:
+        try:
+            sheets[sheet_title] = read_sheet_values(spreadsheet_id, sheet_title)
+        except Exception as e:
+            logger.warning(f"Failed to read {sheet_title} sheet: {e}")
+    return sheets
+
+
+def _parse_accounts_values(values: list[list]) -> list[ImportedAccount]:
+    """Parse account rows of the "Балансы" sheet values."""
     if not values:
         return []
 
     accounts = []
     
-    for i, row in enumerate(values):
+    # Skip header rows (instruction, empty, column headers)
+    for row in islice(values, 3, None):
         if not row:
             continue
         
-        # Skip header rows (instruction, empty, column headers)
-        if i < 3:
-            continue
-        
         first_cell = str(row[0]).strip()
         
         # Skip empty/placeholder rows
-        if not first_cell or first_cell in {"Нет счетов", "(no accounts)"}:
+        if not first_cell or first_cell in _ACCOUNT_PLACEHOLDER_ROWS:
             continue
         
         # Parse account row: Счет | Валюта | Баланс | Основной
@@ -100,11 +150,10 @@ def parse_accounts_from_balances_sheet(spreadsheet_id: str) -> list[ImportedAcco
                 currency = str(row[1]).strip().upper()
                 
                 # Parse initial balance if provided
-                initial_balance = Decimal("0")
+                initial_balance = _DEC_ZERO
                 if len(row) > 2 and row[2]:
                     try:
-                        balance_str = str(row[2]).strip().replace(" ", "").replace(",", ".")
-                        initial_balance = Decimal(balance_str)
+                        initial_balance = _parse_amount(str(row[2]))
                     except:
                         pass  # Keep 0 if parsing fails
                 
@@ -123,65 +172,29 @@ def parse_accounts_from_balances_sheet(spreadsheet_id: str) -> list[ImportedAcco
     return accounts
 
 
-def parse_transactions_from_month_sheets(
-    spreadsheet_id: str, db: Session, user_id: int
-) -> list[ImportedTransaction]:
-    """Read and parse transactions from monthly sheets (YYYY-MM).
-
-    Expected format in each sheet:
-    Дата | Тип | Сумма | Валюта | Счет | Категория | Описание
-
-    Returns list of ImportedTransaction objects from all monthly sheets.
-    """
-    from services.sheets_export import get_user_transaction_months, build_month_sheet_title
-    
-    # Get list of all months to check
-    months = get_user_transaction_months(db, user_id)
-    
-    all_transactions = []
-    
-    for year, month in months:
-        sheet_title = build_month_sheet_title(year, month)
-        
-        try:
-            values = read_sheet_values(spreadsheet_id, sheet_title)
-        except Exception as e:
-            logger.warning(f"Failed to read {sheet_title} sheet: {e}")
+def _iter_month_values(values: list[list]) -> Iterator[ImportedTransaction]:
+    """Parse transaction rows of one monthly sheet's values."""
+    # Skip header rows (instruction, empty, column headers)
+    for row in islice(values, 3, None):
+        if not row:
             continue
         
-        if not values:
+        first_cell = str(row[0]).strip()
+        
+        # Skip empty/placeholder rows and summary rows
+        if not first_cell or _NO_OPERATIONS_RE.search(first_cell) or _SUMMARY_MARKERS_RE.search(first_cell):
             continue
         
-        for i, row in enumerate(values):
-            if not row:
-                continue
-            
-            # Skip header rows (instruction, empty, column headers)
-            if i < 3:
-                continue
-            
-            first_cell = str(row[0]).strip()
-            
-            # Skip empty/placeholder rows and summary rows
-            if not first_cell or "Нет операций" in first_cell or "═" in first_cell:
-                continue
-            
-            # Skip summary rows (they now appear in columns I-J, but might leak into parsing)
-            if "ИТОГО" in first_cell or "💰" in first_cell or "💸" in first_cell or "📈" in first_cell or "📂" in first_cell:
+        # Parse transaction row
+        if len(row) >= 5:
+            try:
+                tx = _parse_transaction_row(row)
+            except Exception as e:
+                logger.warning(f"Failed to parse row {row}: {e}")
                 continue
-            
-            # Parse transaction row
-            if len(row) >= 5:
-                try:
-                    tx = _parse_transaction_row(row)
-                    if tx:
-                        all_transactions.append(tx)
-                        logger.debug(f"Parsed transaction: {tx.operation_date.date()} {tx.transaction_type} {tx.amount} {tx.currency}")
-                except Exception as e:
-                    logger.warning(f"Failed to parse row {row}: {e}")
-                    continue
-    
-    return all_transactions
+            if tx:
+                logger.debug(f"Parsed transaction: {tx.operation_date.date()} {tx.transaction_type} {tx.amount} {tx.currency}")
+                yield tx
 
 
 def _parse_transaction_row(row: list) -> Optional[ImportedTransaction]:
@@ -192,13 +205,11 @@ def _parse_transaction_row(row: list) -> Optional[ImportedTransaction]:
     if len(row) < 5:
         return None
 
-    date_str = str(row[0]).strip()
-    type_str = str(row[1]).strip().lower()
-    amount_str = str(row[2]).strip()
-    currency = str(row[3]).strip().upper()
-    account_name = str(row[4]).strip()
-    category = str(row[5]).strip() if len(row) > 5 else None
-    description = str(row[6]).strip() if len(row) > 6 else None
+    cells = [c.strip() if isinstance(c, str) else str(c).strip() for c in row[:7]]
+    cells += [""] * (7 - len(cells))
+    date_str, type_str, amount_str, currency, account_name, category, description = cells
+    type_str = type_str.lower()
+    currency = currency.upper()
 
     # Skip empty/invalid rows
     if not date_str or not amount_str or not account_name:
@@ -206,35 +217,25 @@ def _parse_transaction_row(row: list) -> Optional[ImportedTransaction]:
 
     # Parse date (support DD.MM.YYYY HH:MM, DD.MM.YYYY, or YYYY-MM-DD)
     try:
-        if "." in date_str:
-            # Check if time is included
-            if " " in date_str and ":" in date_str:
-                operation_date = datetime.strptime(date_str, "%d.%m.%Y %H:%M")
-            else:
-                operation_date = datetime.strptime(date_str, "%d.%m.%Y")
-        elif "-" in date_str and len(date_str) == 10:
-            operation_date = datetime.strptime(date_str, "%Y-%m-%d")
-        else:
-            return None
+        operation_date = _parse_date(date_str)
     except ValueError:
         logger.warning(f"Invalid date format: {date_str}")
         return None
+    if operation_date is None:
+        return None
 
     # Parse amount (support "1 234,56" or "1234.56")
     try:
-        amount_clean = amount_str.replace(" ", "").replace(",", ".")
-        # Remove currency symbols
-        amount_clean = amount_clean.replace("₽", "").replace("$", "").replace("€", "")
-        amount = Decimal(amount_clean)
+        amount = _parse_amount(amount_str)
     except Exception:
         logger.warning(f"Invalid amount: {amount_str}")
         return None
 
     # Determine transaction type
     transaction_type = None
-    if type_str in {"доход", "income", "+", "💰"}:
+    if type_str in _INCOME_TYPES:
         transaction_type = "income"
-    elif type_str in {"расход", "expense", "-", "💸"}:
+    elif type_str in _EXPENSE_TYPES:
         transaction_type = "expense"
     else:
         logger.warning(f"Unknown transaction type: {type_str}")
@@ -249,3 +250,36 @@ def _parse_transaction_row(row: list) -> Optional[ImportedTransaction]:
         category=category if category and category != "—" else None,
         description=description if description and description != "—" else None,
     )
+
+
+def _parse_amount(amount_str: str) -> Decimal:
+    """Parse amount like "1 234,56", "1234.56" or "$15" into Decimal."""
+    return Decimal(amount_str.translate(_AMOUNT_TRANS))
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(date_str: str) -> Optional[datetime]:
+    """Parse DD.MM.YYYY HH:MM, DD.MM.YYYY or YYYY-MM-DD.
+
+    Returns None for other formats, raises ValueError for invalid dates.
+    Cached: monthly sheets repeat the same timestamps a lot.
+    """
+    # Fast path for the format we export: DD.MM.YYYY HH:MM
+    if (
+        len(date_str) == 16
+        and date_str[2] == "." and date_str[5] == "." and date_str[10] == " " and date_str[13] == ":"
+        and (date_str[:2] + date_str[3:5] + date_str[6:10] + date_str[11:13] + date_str[14:]).isdigit()
+    ):
+        return datetime(
+            int(date_str[6:10]), int(date_str[3:5]), int(date_str[:2]),
+            int(date_str[11:13]), int(date_str[14:]),
+        )
+    
+    if "." in date_str:
+        # Check if time is included
+        if " " in date_str and ":" in date_str:
+            return datetime.strptime(date_str, "%d.%m.%Y %H:%M")
+        return datetime.strptime(date_str, "%d.%m.%Y")
+    if "-" in date_str and len(date_str) == 10:
+        return datetime.strptime(date_str, "%Y-%m-%d")
+    return None
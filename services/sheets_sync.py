@@ -9,73 +9,105 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import re
+from typing import Optional
 
 from sqlalchemy.orm import Session
 
 from db.models import User
 from services.google_sheets_client import (
-    ensure_sheet,
-    clear_and_update_values,
+    ensure_sheets,
+    batch_clear_and_update_values,
     get_spreadsheet_url,
     get_sheets_service,
-    get_all_sheet_titles,
-    delete_sheet_by_title,
 )
 from services.sheets_export import (
     build_balances_sheet_title,
     build_balances_export,
     build_month_sheet_title,
     build_month_transactions_export,
+    get_account_names,
+    get_month_category_totals,
     get_user_transaction_months,
 )
-from services.sheets_format import format_balances_sheet, format_month_sheet
+from services.sheets_format import (
+    balances_sheet_format_requests,
+    month_sheet_format_requests,
+    format_sheets,
+)
 
 logger = logging.getLogger(__name__)
 
+MONTH_SHEET_TITLE_RE = re.compile(r'^\d{4}-\d{2}$')  # Matches YYYY-MM
 
-def sync_user_to_sheets(db: Session, user_id: int, spreadsheet_id: str) -> str:
-    """Sync user data to multiple sheets with formatting. Returns spreadsheet URL."""
-    import re
-    
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+
+def sync_user_to_sheets(
+    db: Session, user_id: int, spreadsheet_id: str, user: Optional[User] = None
+) -> str:
+    """Sync user data to multiple sheets with formatting. Returns spreadsheet URL.
+
+    Pass user if the caller already has it loaded to skip the existence check query.
+    """
+    sheet_values = _build_sheet_values(db, user_id, user)
+    return _write_sheets(spreadsheet_id, user_id, sheet_values)
+
+
+async def sync_user_to_sheets_async(
+    db: Session, user_id: int, spreadsheet_id: str, user: Optional[User] = None
+) -> str:
+    """Async variant of sync_user_to_sheets."""
+    # Compute phase: DB queries only, done once under the session
+    sheet_values = await asyncio.to_thread(_build_sheet_values, db, user_id, user)
+    # IO phase: a fixed number of batched Sheets API calls
+    return await asyncio.to_thread(_write_sheets, spreadsheet_id, user_id, sheet_values)
+
+
+def _build_sheet_values(db: Session, user_id: int, user: Optional[User] = None) -> dict[str, list[list]]:
+    """Build values of "Балансы" (first) and every monthly sheet, keyed by sheet title."""
+    if user is None and db.query(User.id).filter(User.id == user_id).first() is None:
         raise ValueError(f"User {user_id} not found")
     
-    service = get_sheets_service()
-    
-    # 1. Sync balances sheet
-    balances_title = build_balances_sheet_title()
-    balances_values = build_balances_export(db, user_id)
-    balances_gid = ensure_sheet(spreadsheet_id, balances_title)
-    clear_and_update_values(spreadsheet_id, balances_title, balances_values)
-    format_balances_sheet(service, spreadsheet_id, balances_gid)
-    
-    # 2. Get current months and create a set of expected sheet titles
+    sheet_values = {build_balances_sheet_title(): build_balances_export(db, user_id)}
     months = get_user_transaction_months(db, user_id)
-    expected_month_titles = {build_month_sheet_title(year, month) for year, month in months}
+    if not months:
+        return sheet_values
     
-    # 3. Delete old monthly sheets that are no longer needed
-    all_sheets = get_all_sheet_titles(spreadsheet_id)
-    month_pattern = re.compile(r'^\d{4}-\d{2}$')  # Matches YYYY-MM
-    for sheet_title in all_sheets:
-        # If it looks like a monthly sheet but isn't in our expected set, delete it
-        if month_pattern.match(sheet_title) and sheet_title not in expected_month_titles:
-            logger.info(f"Deleting old monthly sheet: {sheet_title}")
-            delete_sheet_by_title(spreadsheet_id, sheet_title)
-    
-    # 4. Sync monthly sheets (current months)
+    # Shared by every month: one account-name query and one grouped totals query per sync;
+    # each month then only streams its own listing
+    account_names = get_account_names(db, user_id)
+    totals_by_month = get_month_category_totals(db, user_id)
     for year, month in months:
-        month_title = build_month_sheet_title(year, month)
-        month_values = build_month_transactions_export(db, user_id, year, month)
-        month_gid = ensure_sheet(spreadsheet_id, month_title)
-        clear_and_update_values(spreadsheet_id, month_title, month_values)
-        format_month_sheet(service, spreadsheet_id, month_gid)
+        sheet_values[build_month_sheet_title(year, month)] = list(
+            build_month_transactions_export(
+                db, user_id, year, month,
+                account_names=account_names,
+                category_totals=totals_by_month.get((year, month), ()),
+            )
+        )
+    return sheet_values
+
+
+def _write_sheets(spreadsheet_id: str, user_id: int, sheet_values: dict[str, list[list]]) -> str:
+    """Create/delete sheets, write values and apply formatting in batch calls. Returns URL of "Балансы"."""
+    # Ensure all sheets exist and delete monthly sheets that are no longer needed
+    sheet_gids = ensure_sheets(spreadsheet_id, sheet_values, delete_if=_is_month_sheet_title)
+    
+    balances_title = build_balances_sheet_title()
+    format_requests = []
+    for title, gid in sheet_gids.items():
+        if title == balances_title:
+            format_requests.extend(balances_sheet_format_requests(gid))
+        else:
+            format_requests.extend(month_sheet_format_requests(gid))
+    
+    batch_clear_and_update_values(spreadsheet_id, sheet_values)
+    format_sheets(get_sheets_service(), spreadsheet_id, format_requests)
     
     logger.info(f"Google Sheets sync completed for user {user_id}")
     # Return URL pointing to balances sheet
-    return get_spreadsheet_url(spreadsheet_id, gid=balances_gid)
+    return get_spreadsheet_url(spreadsheet_id, gid=sheet_gids[balances_title])
 
 
-async def sync_user_to_sheets_async(db: Session, user_id: int, spreadsheet_id: str) -> str:
-    """Async wrapper for sync_user_to_sheets."""
-    return await asyncio.to_thread(sync_user_to_sheets, db, user_id, spreadsheet_id)
+def _is_month_sheet_title(title: str) -> bool:
+    """Whether a sheet looks like a monthly sheet (YYYY-MM)."""
+    return MONTH_SHEET_TITLE_RE.match(title) is not None
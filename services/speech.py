@@ -1,47 +1,90 @@
 """Speech-to-text service using SpeechFlow.io API."""
+import os
 import logging
 import asyncio
 import aiohttp
-from typing import Optional
+from typing import Optional, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
-# SpeechFlow API credentials
-API_KEY_ID = "sKLTeeTIGX9vpp2s"
-API_KEY_SECRET = "usDy2871P776xRm6"
-
 # API endpoints
 CREATE_URL = "https://api.speechflow.io/asr/file/v1/create"
 QUERY_URL = "https://api.speechflow.io/asr/file/v1/query"
 
+# Bound the whole request (connect + upload + response)
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30)
+
+# Shared session: keeps connections (and TLS) alive between transcriptions,
+# carries auth headers for every request
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def _get_credentials() -> Optional[Tuple[str, str]]:
+    """Return SpeechFlow (key id, key secret) from the environment, or None if not configured.
+
+    Read on use rather than at import so values loaded from .env are picked up.
+    """
+    key_id = os.getenv("SPEECHFLOW_KEY_ID")
+    key_secret = os.getenv("SPEECHFLOW_KEY_SECRET")
+    if not key_id or not key_secret:
+        return None
+    return key_id, key_secret
+
+
+def is_enabled() -> bool:
+    """Whether voice input is available (SpeechFlow credentials are configured)."""
+    return _get_credentials() is not None
+
+
+def _get_session(credentials: Tuple[str, str]) -> aiohttp.ClientSession:
+    """Return shared HTTP session, creating it on first use."""
+    global _session
+    if _session is None or _session.closed:
+        key_id, key_secret = credentials
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=60),
+            timeout=REQUEST_TIMEOUT,
+            headers={"keyId": key_id, "keySecret": key_secret},
+        )
+    return _session
 
-async def transcribe_audio(file_path: str, lang: str = "ru") -> Optional[str]:
+
+async def close_session() -> None:
+    """Close shared HTTP session (call on shutdown)."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+async def transcribe_audio(audio: Union[str, bytes], lang: str = "ru") -> Optional[str]:
     """
-    Transcribe audio file using SpeechFlow API.
+    Transcribe audio using SpeechFlow API.
     
     Args:
-        file_path: Path to the audio file (local or remote URL)
+        audio: Audio bytes, or a path to the audio file (local or remote URL)
         lang: Language code (ru, en, etc.)
     
     Returns:
         Transcribed text or None if failed
     """
-    headers = {
-        "keyId": API_KEY_ID,
-        "keySecret": API_KEY_SECRET
-    }
+    credentials = _get_credentials()
+    if credentials is None:
+        logger.error("SPEECHFLOW_KEY_ID / SPEECHFLOW_KEY_SECRET are not set, voice input is disabled")
+        return None
     
     try:
-        async with aiohttp.ClientSession() as session:
-            # Create transcription task
-            task_id = await _create_task(session, file_path, lang, headers)
-            if not task_id:
-                return None
-            
-            # Query for results
-            text = await _query_result(session, task_id, headers)
-            return text
-            
+        session = _get_session(credentials)
+        
+        # Create transcription task
+        task_id = await _create_task(session, audio, lang)
+        if not task_id:
+            return None
+        
+        # Query for results
+        text = await _query_result(session, task_id)
+        return text
+        
     except Exception as e:
         logger.error(f"Speech transcription error: {e}")
         return None
@@ -49,63 +92,72 @@ async def transcribe_audio(file_path: str, lang: str = "ru") -> Optional[str]:
 
 async def _create_task(
     session: aiohttp.ClientSession, 
-    file_path: str, 
-    lang: str, 
-    headers: dict
+    audio: Union[str, bytes], 
+    lang: str
 ) -> Optional[str]:
     """Create a transcription task."""
     try:
-        if file_path.startswith('http'):
+        if isinstance(audio, (bytes, bytearray)):
+            # In-memory audio
+            data = aiohttp.FormData()
+            data.add_field('file', bytes(audio), filename='audio.ogg', content_type='audio/ogg')
+            return await _post_create(session, f"{CREATE_URL}?lang={lang}", data)
+        
+        if audio.startswith('http'):
             # Remote file
-            data = {"lang": lang, "remotePath": file_path}
-            async with session.post(CREATE_URL, data=data, headers=headers) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    if result.get("code") == 10000:
-                        task_id = result.get("taskId")
-                        logger.info(f"Created transcription task: {task_id}")
-                        return task_id
-                    else:
-                        logger.error(f"Create task error: {result.get('msg')}")
-                else:
-                    logger.error(f"Create request failed: {response.status}")
-        else:
-            # Local file
-            url = f"{CREATE_URL}?lang={lang}"
-            with open(file_path, "rb") as f:
-                data = aiohttp.FormData()
-                data.add_field('file', f, filename='audio.ogg')
-                async with session.post(url, data=data, headers=headers) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        if result.get("code") == 10000:
-                            task_id = result.get("taskId")
-                            logger.info(f"Created transcription task: {task_id}")
-                            return task_id
-                        else:
-                            logger.error(f"Create task error: {result.get('msg')}")
-                    else:
-                        logger.error(f"Create request failed: {response.status}")
+            data = {"lang": lang, "remotePath": audio}
+            return await _post_create(session, CREATE_URL, data)
+        
+        # Local file: aiohttp streams the file object in chunks (reads run in executor),
+        # only open() itself needs to be moved off the event loop
+        f = await asyncio.to_thread(open, audio, "rb")
+        with f:
+            data = aiohttp.FormData()
+            data.add_field('file', f, filename='audio.ogg', content_type='audio/ogg')
+            return await _post_create(session, f"{CREATE_URL}?lang={lang}", data)
     except Exception as e:
         logger.error(f"Error creating transcription task: {e}")
     
     return None
 
 
+async def _post_create(
+    session: aiohttp.ClientSession,
+    url: str,
+    data
+) -> Optional[str]:
+    """Send create request and return task id."""
+    async with session.post(url, data=data) as response:
+        if response.status == 200:
+            result = await response.json()
+            if result.get("code") == 10000:
+                task_id = result.get("taskId")
+                logger.info(f"Created transcription task: {task_id}")
+                return task_id
+            else:
+                logger.error(f"Create task error: {result.get('msg')}")
+        else:
+            logger.error(f"Create request failed: {response.status}")
+    return None
+
+
 async def _query_result(
     session: aiohttp.ClientSession, 
     task_id: str, 
-    headers: dict,
     max_attempts: int = 30,
     poll_interval: float = 2.0
 ) -> Optional[str]:
-    """Query for transcription result."""
+    """Query for transcription result.
+
+    Polls with growing delay (0.3s, 0.5s, 0.8s, 1.2s, ...) capped at poll_interval,
+    so short recordings are picked up quickly.
+    """
     # Result type 4 = plain text
     query_url = f"{QUERY_URL}?taskId={task_id}&resultType=4"
     
     for attempt in range(max_attempts):
         try:
-            async with session.get(query_url, headers=headers) as response:
+            async with session.get(query_url) as response:
                 if response.status == 200:
                     result = await response.json()
                     code = result.get("code")
@@ -118,7 +170,7 @@ async def _query_result(
                     elif code == 11001:
                         # Still processing
                         logger.debug(f"Transcription in progress, attempt {attempt + 1}/{max_attempts}")
-                        await asyncio.sleep(poll_interval)
+                        await asyncio.sleep(min(poll_interval, 0.3 * 1.6 ** attempt))
                         continue
                     else:
                         logger.error(f"Transcription error: {result.get('msg')}")
@@ -145,33 +197,18 @@ async def transcribe_telegram_voice(bot, file_id: str) -> Optional[str]:
     Returns:
         Transcribed text or None if failed
     """
-    import tempfile
-    import os
-    
     try:
         # Get file from Telegram
         file = await bot.get_file(file_id)
         
-        # Download to temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".ogg") as temp_file:
-            temp_path = temp_file.name
-            await file.download_to_drive(temp_path)
-        
-        logger.info(f"Downloaded voice message to {temp_path}")
+        # Download into memory (voice messages are small) instead of a temp file.
+        # Telegram's file URL is not passed as remotePath: it contains the bot token.
+        audio = await file.download_as_bytearray()
+        logger.info(f"Downloaded voice message ({len(audio)} bytes)")
         
         # Transcribe
-        text = await transcribe_audio(temp_path, lang="ru")
-        
-        # Clean up
-        try:
-            os.unlink(temp_path)
-        except:
-            pass
-        
-        return text
+        return await transcribe_audio(bytes(audio), lang="ru")
         
     except Exception as e:
         logger.error(f"Error transcribing Telegram voice: {e}")
         return None
-
-
@@ -0,0 +1,36 @@
+"""Shared test fixtures."""
+import os
+
+# Point the app at a throwaway in-memory SQLite database before db.session is imported
+# (load_dotenv does not override variables that are already set)
+os.environ["DATABASE_URL"] = "sqlite://"
+
+import pytest
+from decimal import Decimal
+from sqlalchemy.orm import Session
+
+from db.models import Base, User, Account
+from db.session import SessionLocal, init_db, engine
+from services.ledger import get_or_create_user, create_account
+
+
+@pytest.fixture(scope="function")
+def db():
+    """Create test database session."""
+    init_db()
+    db = SessionLocal()
+    yield db
+    db.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def user(db: Session):
+    """Create test user."""
+    return get_or_create_user(db, 12345, "Europe/Moscow")
+
+
+@pytest.fixture
+def account(db: Session, user: User):
+    """Create test account with 1000 RUB."""
+    return create_account(db, user.id, "Основной", "RUB", Decimal("1000.00"))
@@ -0,0 +1,162 @@
+"""Tests for insights."""
+from decimal import Decimal
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import services.insights as insights
+from db.models import User, Account
+from services.insights import get_insight
+from services.ledger import create_account, add_income, add_expense
+
+
+@pytest.fixture(autouse=True)
+def fixed_now(monkeypatch):
+    """Pin "now" to mid-March 2025 so the prev_month baseline is February."""
+    monkeypatch.setattr(
+        insights, "now_in_timezone",
+        lambda tz: datetime(2025, 3, 15, 12, 0, tzinfo=ZoneInfo(tz))
+    )
+
+
+def _march_insight(db: Session, user: User, metric: str = "expense", **filters):
+    """Insight for March 2025 (custom period) compared to February."""
+    return get_insight(db, user.id, metric, filters.pop("category", None), None,
+                       "2025-03-01", "2025-03-31", **filters)
+
+
+def _add_march_expenses(db: Session, user: User, account: Account):
+    """Expenses with tied amounts, days and merchants."""
+    for amount, description, day in [
+        ("100.00", "Магнит", 2), ("100.00", "Пятёрочка", 3), ("50.00", "Магнит", 3),
+        ("150.00", "Аптека", 4), ("30.25", None, 5), ("19.75", "", 5),
+    ]:
+        add_expense(db, user.id, Decimal(amount), "RUB", account.id, category="Еда",
+                    description=description, operation_date=datetime(2025, 3, day, 10, 0))
+
+
+def test_insight_tops_same_in_memory_and_sql(db: Session, user: User, account: Account, monkeypatch):
+    """Test small (in-memory) and large (SQL) periods produce identical tops."""
+    _add_march_expenses(db, user, account)
+
+    in_memory = _march_insight(db, user)
+    monkeypatch.setattr(insights, "IN_MEMORY_TOPS_MAX_ROWS", 0)
+    from_db = _march_insight(db, user)
+
+    assert in_memory == from_db
+    assert [tuple(txn) for txn in in_memory["top_transactions"]] == [tuple(txn) for txn in from_db["top_transactions"]]
+    assert [txn._fields for txn in in_memory["top_transactions"]] == [txn._fields for txn in from_db["top_transactions"]]
+    assert in_memory["top_days"] == [
+        {"date": date(2025, 3, 3), "amount": Decimal("150.00")},
+        {"date": date(2025, 3, 4), "amount": Decimal("150.00")},
+        {"date": date(2025, 3, 2), "amount": Decimal("100.00")},
+        {"date": date(2025, 3, 5), "amount": Decimal("50.00")},
+    ]
+    assert in_memory["top_merchants"] == [
+        {"description": "Аптека", "amount": Decimal("150.00")},
+        {"description": "Магнит", "amount": Decimal("150.00")},
+        {"description": "Пятёрочка", "amount": Decimal("100.00")},
+    ]
+    assert [txn.description for txn in in_memory["top_transactions"]] == [
+        "Аптека", "Магнит", "Пятёрочка", "Магнит", None, ""
+    ]
+
+
+def test_insight_negative_change(db: Session, user: User, account: Account):
+    """Test spending less than the baseline gives a negative delta."""
+    add_expense(db, user.id, Decimal("200.00"), "RUB", account.id, category="Еда",
+                operation_date=datetime(2025, 2, 10, 10, 0))
+    add_expense(db, user.id, Decimal("150.00"), "RUB", account.id, category="Еда",
+                operation_date=datetime(2025, 3, 10, 10, 0))
+
+    insight = _march_insight(db, user)
+
+    assert insight["current_total"] == Decimal("150.00")
+    assert insight["baseline_total"] == Decimal("200.00")
+    assert insight["delta"] == Decimal("-50.00")
+    assert insight["delta_pct"] == -25.0
+
+
+def test_insight_zero_baseline(db: Session, user: User, account: Account):
+    """Test an empty baseline period gives no percentage change."""
+    add_expense(db, user.id, Decimal("150.00"), "RUB", account.id, category="Еда",
+                operation_date=datetime(2025, 3, 10, 10, 0))
+
+    insight = _march_insight(db, user)
+
+    assert insight["baseline_total"] == Decimal("0.00")
+    assert insight["delta"] == Decimal("150.00")
+    assert insight["delta_pct"] == 0.0
+
+
+@pytest.mark.parametrize("max_rows", [insights.IN_MEMORY_TOPS_MAX_ROWS, 0])
+def test_insight_zero_amounts_still_list_tops(db: Session, user: User, account: Account, monkeypatch, max_rows):
+    """Test a period whose transactions are all zero still lists them."""
+    monkeypatch.setattr(insights, "IN_MEMORY_TOPS_MAX_ROWS", max_rows)
+    add_expense(db, user.id, Decimal("0.00"), "RUB", account.id, category="Еда",
+                description="Бонус", operation_date=datetime(2025, 3, 10, 10, 0))
+
+    insight = _march_insight(db, user)
+
+    assert insight["current_total"] == Decimal("0.00")
+    assert [txn.description for txn in insight["top_transactions"]] == ["Бонус"]
+    assert insight["top_days"] == [{"date": date(2025, 3, 10), "amount": Decimal("0.00")}]
+    assert insight["top_merchants"] == [{"description": "Бонус", "amount": Decimal("0.00")}]
+
+
+@pytest.mark.parametrize("max_rows", [insights.IN_MEMORY_TOPS_MAX_ROWS, 0])
+def test_insight_empty_period_skips_top_queries(db: Session, user: User, account: Account, monkeypatch, max_rows):
+    """Test an empty period runs only the user lookup and the two totals."""
+    monkeypatch.setattr(insights, "IN_MEMORY_TOPS_MAX_ROWS", max_rows)
+    add_expense(db, user.id, Decimal("10.00"), "RUB", account.id, category="Еда",
+                operation_date=datetime(2025, 2, 10, 10, 0))
+    user.id  # refresh the expired user before counting
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        insight = _march_insight(db, user)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert insight["top_transactions"] == []
+    assert insight["top_days"] == []
+    assert insight["top_merchants"] == []
+    assert len(statements) == 3
+    assert not any("ORDER BY" in statement or "GROUP BY" in statement for statement in statements)
+
+
+def test_insight_repeated_calls_bind_own_filters(db: Session, user: User, account: Account):
+    """Test cached statements get each call's filter values, not a previous call's."""
+    usd = create_account(db, user.id, "Доллары", "USD", Decimal("100.00"))
+    add_expense(db, user.id, Decimal("100.00"), "RUB", account.id, category="Еда",
+                operation_date=datetime(2025, 3, 2, 10, 0))
+    add_expense(db, user.id, Decimal("40.00"), "RUB", account.id, category="Транспорт",
+                operation_date=datetime(2025, 3, 3, 10, 0))
+    add_expense(db, user.id, Decimal("7.00"), "USD", usd.id, category="Еда",
+                operation_date=datetime(2025, 3, 4, 10, 0))
+    add_income(db, user.id, Decimal("500.00"), "RUB", account.id, category="Зарплата",
+               operation_date=datetime(2025, 3, 5, 10, 0))
+
+    calls = [
+        ({"category": "Еда", "currency": "RUB"}, Decimal("100.00")),
+        ({"category": "Транспорт", "currency": "RUB"}, Decimal("40.00")),
+        ({"category": "Еда", "currency": "USD"}, Decimal("7.00")),
+        ({"account_name": "Доллары"}, Decimal("7.00")),
+        ({"account_name": "Основной", "currency": "RUB"}, Decimal("140.00")),
+        ({"category": "Еда", "currency": "RUB"}, Decimal("100.00")),
+    ]
+    for filters, expected in calls:
+        insight = _march_insight(db, user, **filters)
+        assert insight["current_total"] == expected, filters
+
+    income = _march_insight(db, user, metric="income", currency="RUB")
+    assert income["current_total"] == Decimal("500.00")
+    assert [txn.category for txn in income["top_transactions"]] == ["Зарплата"]
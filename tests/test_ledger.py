@@ -5,38 +5,15 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 
 from db.models import User, Account, Transaction, TransactionType
-from db.session import SessionLocal, init_db, engine
 from services.ledger import (
     get_or_create_user, add_income, add_expense, transfer,
     create_account, delete_account, rename_account, set_default_account,
     find_account_by_name, update_transaction, delete_transaction_by_id,
-    list_user_transactions, get_transaction_by_row_number
+    list_user_transactions, get_transaction_by_row_number, create_transactions_bulk,
+    clear_user_data, get_total_balances
 )
 
 
-@pytest.fixture(scope="function")
-def db():
-    """Create test database session."""
-    init_db()
-    db = SessionLocal()
-    yield db
-    db.close()
-    from db.models import Base
-    Base.metadata.drop_all(bind=engine)
-
-
-@pytest.fixture
-def user(db: Session):
-    """Create test user."""
-    return get_or_create_user(db, 12345, "Europe/Moscow")
-
-
-@pytest.fixture
-def account(db: Session, user: User):
-    """Create test account with 1000 RUB."""
-    return create_account(db, user.id, "Основной", "RUB", Decimal("1000.00"))
-
-
 # === User Tests ===
 
 def test_get_or_create_user_new(db: Session):
@@ -69,6 +46,14 @@ def test_create_account_basic(db: Session, user: User):
     assert acc.balance == Decimal("0.00")
 
 
+def test_create_first_account_sets_default(db: Session, user: User):
+    """Test first account becomes user's default account."""
+    acc = create_account(db, user.id, "Наличка", "RUB")
+    db.refresh(user)
+    assert acc.is_default is True
+    assert user.default_account_id == acc.id
+
+
 def test_create_account_with_balance(db: Session, user: User):
     """Test account creation with initial balance."""
     acc = create_account(db, user.id, "Карта", "USD", Decimal("500.00"))
@@ -89,6 +74,25 @@ def test_find_account_fuzzy(db: Session, user: User, account: Account):
     assert found.id == account.id
 
 
+def test_find_account_prefers_exact(db: Session, user: User, account: Account):
+    """Test exact (case-insensitive) match wins over partial match."""
+    card = create_account(db, user.id, "Карта", "RUB")
+    create_account(db, user.id, "Карта Сбер", "RUB")
+    found = find_account_by_name(db, user.id, "КАРТА")
+    assert found is not None
+    assert found.id == card.id
+
+
+def test_find_account_wildcards_in_name(db: Session, user: User):
+    """Test % and _ in stored account names are matched literally."""
+    percent = create_account(db, user.id, "Вклад 5%", "RUB")
+    underscore = create_account(db, user.id, "a_b", "RUB")
+    assert find_account_by_name(db, user.id, "мой вклад 5% годовых").id == percent.id
+    assert find_account_by_name(db, user.id, "счет a_b").id == underscore.id
+    assert find_account_by_name(db, user.id, "вклад 5 лет") is None
+    assert find_account_by_name(db, user.id, "axb") is None
+
+
 def test_find_account_not_found(db: Session, user: User):
     """Test account not found."""
     found = find_account_by_name(db, user.id, "Несуществующий")
@@ -288,3 +292,87 @@ def test_delete_transaction_income(db: Session, user: User, account: Account):
     db.refresh(account)
     # Balance should be restored
     assert account.balance == balance_after_income - Decimal("500.00")
+
+
+def test_delete_transaction_transfer(db: Session, user: User, account: Account):
+    """Test deleting transfer restores both account balances."""
+    acc2 = create_account(db, user.id, "Наличка", "RUB", Decimal("0.00"))
+    tx = transfer(db, user.id, Decimal("300.00"), "RUB", account.id, acc2.id)
+    
+    delete_transaction_by_id(db, user.id, tx.id)
+    
+    db.refresh(account)
+    db.refresh(acc2)
+    assert account.balance == Decimal("1000.00")
+    assert acc2.balance == Decimal("0.00")
+
+def test_create_transactions_bulk(db: Session, user: User, account: Account):
+    """Test bulk import creates transactions without touching balance."""
+    created = create_transactions_bulk(db, user.id, [
+        {"transaction_type": "expense", "amount": Decimal("100.00"), "currency": "RUB",
+         "account_id": account.id, "operation_date": datetime(2025, 12, 1, 10, 0)},
+        {"transaction_type": "income", "amount": Decimal("500.00"), "currency": "RUB",
+         "account_id": account.id, "category": "Зарплата"},
+    ])
+    db.commit()
+    
+    db.refresh(account)
+    assert created == 2
+    assert account.balance == Decimal("1000.00")
+    transactions = list_user_transactions(db, user.id)
+    assert {tx.type for _, tx in transactions} == {TransactionType.INCOME, TransactionType.EXPENSE}
+
+
+def test_create_transactions_bulk_chunks(db: Session, user: User, account: Account):
+    """Test bulk import consumes a generator across several INSERT chunks."""
+    from services.ledger import BULK_INSERT_CHUNK_SIZE
+    
+    count = BULK_INSERT_CHUNK_SIZE * 2 + 1
+    rows = (
+        {"transaction_type": "expense", "amount": Decimal("1.00"), "currency": "RUB",
+         "account_id": account.id, "operation_date": datetime(2025, 12, 1, 10, 0)}
+        for _ in range(count)
+    )
+    created = create_transactions_bulk(db, user.id, rows)
+    db.commit()
+    
+    assert created == count
+    assert len(list_user_transactions(db, user.id, limit=count + 1)) == count
+
+
+def test_clear_user_data(db: Session, user: User, account: Account):
+    """Test clearing removes transactions, accounts and resets default."""
+    add_expense(db, user.id, Decimal("100.00"), "RUB", account.id)
+    add_income(db, user.id, Decimal("50.00"), "RUB", account.id)
+    
+    assert clear_user_data(db, user.id) == (2, 1)
+    
+    db.refresh(user)
+    assert user.default_account_id is None
+    assert db.query(Account).filter(Account.user_id == user.id).count() == 0
+    assert list_user_transactions(db, user.id) == []
+
+
+def test_total_balances_refresh_after_write(db: Session, user: User, account: Account):
+    """Test cached balances are invalidated by ledger writes."""
+    assert get_total_balances(db, user.id) == {"RUB": Decimal("1000.00")}
+    
+    add_expense(db, user.id, Decimal("100.00"), "RUB", account.id)
+    create_account(db, user.id, "Доллары", "USD", Decimal("5.00"))
+    
+    assert get_total_balances(db, user.id) == {"RUB": Decimal("900.00"), "USD": Decimal("5.00")}
+
+
+@pytest.mark.filterwarnings("error::sqlalchemy.exc.SAWarning")
+def test_clear_user_data_then_recreate_account(db: Session, user: User, account: Account):
+    """Test accounts created after clearing are fresh objects (SQLite reuses the rowid)."""
+    old_id = account.id
+    assert clear_user_data(db, user.id) == (0, 1)
+
+    new_account = create_account(db, user.id, "Новый", "RUB", Decimal("5.00"))
+
+    assert new_account is not account
+    assert new_account.id == old_id
+    assert new_account.name == "Новый"
+    assert new_account.balance == Decimal("5.00")
+    assert db.get(User, user.id).default_account_id == new_account.id
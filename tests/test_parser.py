@@ -1,6 +1,7 @@
 """Tests for LLM parser."""
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock
 
 from schemas.llm_schema import LLMResponse, LLMResponseData, PeriodSchema
 from llm.parser import parse_message, _is_valid_response
@@ -43,176 +44,97 @@ def test_is_valid_response_with_errors():
 
 # === Parse Message Tests (Mocked) ===
 
-@pytest.fixture
-def mock_expense_response():
-    """Mock expense response."""
-    return {
-        "intent": "expense",
-        "confidence": 0.95,
-        "data": {
-            "amount": 320,
-            "currency": "RUB",
-            "category": "Кафе и кофе",
-            "subcategory": "кофе"
-        },
-        "errors": []
-    }
-
-
-@pytest.fixture
-def mock_income_response():
-    """Mock income response."""
-    return {
-        "intent": "income",
-        "confidence": 0.95,
-        "data": {
-            "amount": 50000,
-            "currency": "RUB",
-            "category": "Зарплата",
-            "subcategory": "оклад"
-        },
-        "errors": []
-    }
-
-
-@pytest.fixture
-def mock_transfer_response():
-    """Mock transfer response."""
-    return {
-        "intent": "transfer",
-        "confidence": 0.9,
-        "data": {
-            "amount": 10000,
-            "from_account_name": "карта",
-            "to_account_name": "нал"
-        },
-        "errors": []
-    }
-
-
-@patch('llm.parser._call_llm_json_mode')
-def test_parse_expense(mock_llm, mock_expense_response):
-    """Test parsing expense message."""
-    mock_llm.return_value = (mock_expense_response, None)
-    
-    result = parse_message("кофе 320", [], None, "Europe/London")
-    
-    assert result.intent == "expense"
-    assert result.data.amount == 320
-    assert result.data.category == "Кафе и кофе"
+@pytest.fixture(autouse=True)
+def mock_llm(monkeypatch):
+    """Replace the LLM call for every test; set return_value/side_effect per test."""
+    mock = AsyncMock()
+    monkeypatch.setattr("llm.parser._call_llm_json_mode", mock)
+    return mock
 
 
-@patch('llm.parser._call_llm_json_mode')
-def test_parse_income(mock_llm, mock_income_response):
-    """Test parsing income message."""
-    mock_llm.return_value = (mock_income_response, None)
-    
-    result = parse_message("+50000 зп", [], None, "Europe/London")
-    
-    assert result.intent == "income"
-    assert result.data.amount == 50000
+def _parse(message: str):
+    """Run async parse_message with no accounts in London timezone."""
+    return asyncio.run(parse_message(message, [], None, "Europe/London"))
 
 
-@patch('llm.parser._call_llm_json_mode')
-def test_parse_transfer(mock_llm, mock_transfer_response):
-    """Test parsing transfer message."""
-    mock_llm.return_value = (mock_transfer_response, None)
-    
-    result = parse_message("переведи 10к с карты на нал", [], None, "Europe/London")
-    
-    assert result.intent == "transfer"
-    assert result.data.from_account_name == "карта"
-    assert result.data.to_account_name == "нал"
-
-
-@patch('llm.parser._call_llm_json_mode')
-def test_parse_show_accounts(mock_llm):
-    """Test parsing show accounts message."""
-    mock_llm.return_value = ({
-        "intent": "show_accounts",
-        "confidence": 1.0,
-        "data": {},
-        "errors": []
-    }, None)
-    
-    result = parse_message("мои счета", [], None, "Europe/London")
-    
-    assert result.intent == "show_accounts"
-
-
-@patch('llm.parser._call_llm_json_mode')
-def test_parse_report(mock_llm):
-    """Test parsing report message."""
-    mock_llm.return_value = ({
-        "intent": "report",
-        "confidence": 0.95,
-        "data": {
-            "period": {
-                "from": "2025-11-01",
-                "to": "2025-11-30",
-                "preset": "month"
-            }
+@pytest.mark.parametrize("message, payload, expected_data", [
+    (
+        "кофе 320",
+        {
+            "intent": "expense",
+            "confidence": 0.95,
+            "data": {"amount": 320, "currency": "RUB", "category": "Кафе и кофе", "subcategory": "кофе"},
+            "errors": []
         },
-        "errors": []
-    }, None)
-    
-    result = parse_message("отчет за ноябрь", [], None, "Europe/London")
-    
-    assert result.intent == "report"
-
-
-@patch('llm.parser._call_llm_json_mode')
-def test_parse_list_transactions(mock_llm):
-    """Test parsing list transactions message."""
-    mock_llm.return_value = ({
-        "intent": "list_transactions",
-        "confidence": 1.0,
-        "data": {
-            "period": {"preset": "month"}
+        {"amount": 320, "category": "Кафе и кофе"},
+    ),
+    (
+        "+50000 зп",
+        {
+            "intent": "income",
+            "confidence": 0.95,
+            "data": {"amount": 50000, "currency": "RUB", "category": "Зарплата", "subcategory": "оклад"},
+            "errors": []
         },
-        "errors": []
-    }, None)
-    
-    result = parse_message("история операций", [], None, "Europe/London")
-    
-    assert result.intent == "list_transactions"
-
-
-@patch('llm.parser._call_llm_json_mode')
-def test_parse_delete_transaction(mock_llm):
-    """Test parsing delete transaction message."""
-    mock_llm.return_value = ({
-        "intent": "delete_transaction",
-        "confidence": 1.0,
-        "data": {"transaction_id": 3},
-        "errors": []
-    }, None)
-    
-    result = parse_message("удали запись 3", [], None, "Europe/London")
-    
-    assert result.intent == "delete_transaction"
-    assert result.data.transaction_id == 3
-
-
-@patch('llm.parser._call_llm_json_mode')
-def test_parse_insight(mock_llm):
-    """Test parsing insight/analytics message."""
-    mock_llm.return_value = ({
-        "intent": "insight",
-        "confidence": 1.0,
-        "data": {
-            "metric": "expense",
-            "category": "Кафе и кофе"
+        {"amount": 50000},
+    ),
+    (
+        "переведи 10к с карты на нал",
+        {
+            "intent": "transfer",
+            "confidence": 0.9,
+            "data": {"amount": 10000, "from_account_name": "карта", "to_account_name": "нал"},
+            "errors": []
+        },
+        {"from_account_name": "карта", "to_account_name": "нал"},
+    ),
+    (
+        "мои счета",
+        {"intent": "show_accounts", "confidence": 1.0, "data": {}, "errors": []},
+        {},
+    ),
+    (
+        "отчет за ноябрь",
+        {
+            "intent": "report",
+            "confidence": 0.95,
+            "data": {"period": {"from": "2025-11-01", "to": "2025-11-30", "preset": "month"}},
+            "errors": []
+        },
+        {},
+    ),
+    (
+        "история операций",
+        {"intent": "list_transactions", "confidence": 1.0, "data": {"period": {"preset": "month"}}, "errors": []},
+        {},
+    ),
+    (
+        "удали запись 3",
+        {"intent": "delete_transaction", "confidence": 1.0, "data": {"transaction_id": 3}, "errors": []},
+        {"transaction_id": 3},
+    ),
+    (
+        "почему так много на кофе",
+        {
+            "intent": "insight",
+            "confidence": 1.0,
+            "data": {"metric": "expense", "category": "Кафе и кофе"},
+            "errors": []
         },
-        "errors": []
-    }, None)
+        {},
+    ),
+], ids=["expense", "income", "transfer", "show_accounts", "report", "list_transactions", "delete_transaction", "insight"])
+def test_parse_intent(mock_llm, message, payload, expected_data):
+    """Test parsing messages of each intent."""
+    mock_llm.return_value = (payload, None)
     
-    result = parse_message("почему так много на кофе", [], None, "Europe/London")
+    result = _parse(message)
     
-    assert result.intent == "insight"
+    assert result.intent == payload["intent"]
+    for field, value in expected_data.items():
+        assert getattr(result.data, field) == value
 
 
-@patch('llm.parser._call_llm_json_mode')
 def test_parse_fallback_on_error(mock_llm):
     """Test fallback to secondary model on error."""
     # First call fails, second succeeds
@@ -221,18 +143,17 @@ def test_parse_fallback_on_error(mock_llm):
         ({"intent": "expense", "confidence": 0.9, "data": {"amount": 100}, "errors": []}, None)
     ]
     
-    result = parse_message("такси 100", [], None, "Europe/London")
+    result = _parse("такси 100")
     
     assert result.intent == "expense"
     assert mock_llm.call_count == 2
 
 
-@patch('llm.parser._call_llm_json_mode')
 def test_parse_both_models_fail(mock_llm):
     """Test both models failing returns unknown."""
     mock_llm.return_value = (None, "API error")
     
-    result = parse_message("непонятный запрос", [], None, "Europe/London")
+    result = _parse("непонятный запрос")
     
     assert result.intent == "unknown"
     assert len(result.errors) > 0
@@ -0,0 +1,121 @@
+"""Tests for reports."""
+from decimal import Decimal
+from datetime import datetime
+from sqlalchemy.orm import Session
+
+from db.models import User, Account
+from services.ledger import create_account, add_income, add_expense
+from services.reports import get_report, format_report_text, OTHER_CATEGORY, TOP_CATEGORIES
+
+
+def _march_report(db: Session, user: User):
+    """Report for March 2025 (custom period)."""
+    return get_report(db, user.id, None, "2025-03-01", "2025-03-31")
+
+
+def _add_march_data(db: Session, user: User, account: Account) -> Account:
+    """RUB income/expenses and a USD expense in March, plus noise outside the period."""
+    usd = create_account(db, user.id, "Доллары", "USD", Decimal("100.00"))
+    add_income(db, user.id, Decimal("500.00"), "RUB", account.id, category="Зарплата",
+               operation_date=datetime(2025, 3, 1, 10, 0))
+    add_expense(db, user.id, Decimal("100.00"), "RUB", account.id, category="Еда",
+                operation_date=datetime(2025, 3, 2, 10, 0))
+    add_expense(db, user.id, Decimal("50.50"), "RUB", account.id, category="Еда",
+                operation_date=datetime(2025, 3, 3, 10, 0))
+    add_expense(db, user.id, Decimal("20.00"), "RUB", account.id,
+                operation_date=datetime(2025, 3, 4, 10, 0))
+    add_expense(db, user.id, Decimal("5.00"), "USD", usd.id, category="Кофе",
+                operation_date=datetime(2025, 3, 5, 10, 0))
+    add_expense(db, user.id, Decimal("999.00"), "RUB", account.id, category="Еда",
+                operation_date=datetime(2025, 4, 1, 0, 0))
+    return usd
+
+
+def test_report_totals_per_currency(db: Session, user: User, account: Account):
+    """Test income, expense and net are summed per currency."""
+    _add_march_data(db, user, account)
+
+    totals = _march_report(db, user)["totals"]
+
+    assert totals["income"] == {"RUB": Decimal("500.00")}
+    assert totals["expense"] == {"RUB": Decimal("170.50"), "USD": Decimal("5.00")}
+    assert totals["net"] == {"RUB": Decimal("329.50"), "USD": Decimal("-5.00")}
+
+
+def test_report_breakdown_rolls_up_other(db: Session, user: User, account: Account):
+    """Test categories beyond the top ones are rolled up into one "Прочее" row."""
+    # 12 categories: 12.00, 11.00, ..., 1.00 RUB
+    for i in range(1, 13):
+        add_expense(db, user.id, Decimal(i), "RUB", account.id, category=f"Кат{i:02d}",
+                    operation_date=datetime(2025, 3, i, 10, 0))
+
+    breakdown = _march_report(db, user)["breakdown_expense_by_category"]
+
+    top = [item for item in breakdown if not item["other"]]
+    other = [item for item in breakdown if item["other"]]
+    assert [item["category"] for item in top] == [f"Кат{i:02d}" for i in range(12, 2, -1)]
+    assert len(top) == TOP_CATEGORIES
+    assert len(other) == 1
+    assert other[0]["category"] == OTHER_CATEGORY
+    assert other[0]["amount"] == Decimal("3.00")  # 2.00 + 1.00
+    assert other[0]["pct"] == round(3 * 100 / 78, 1)  # of the 78.00 total
+    assert breakdown[-1] is other[0]
+    assert top[0]["pct"] == round(12 * 100 / 78, 1)
+
+
+def test_report_text_currency_sections_in_order(db: Session, user: User, account: Account):
+    """Test totals and breakdown sections are listed by currency code."""
+    usd = _add_march_data(db, user, account)
+    add_income(db, user.id, Decimal("7.00"), "USD", usd.id, category="Кэшбэк",
+               operation_date=datetime(2025, 3, 6, 10, 0))
+
+    text = format_report_text(_march_report(db, user))
+
+    assert text.index("💰 Доходы (RUB)") < text.index("💰 Доходы (USD)")
+    assert text.index("📥 Откуда пришли (доходы, RUB)") < text.index("📥 Откуда пришли (доходы, USD)")
+    assert text.index("📤 Куда ушли (расходы, RUB)") < text.index("📤 Куда ушли (расходы, USD)")
+    assert text.index("📥 Откуда пришли (доходы, USD)") < text.index("📤 Куда ушли (расходы, RUB)")
+
+
+def test_report_text_layout(db: Session, user: User, account: Account):
+    """Test report text keeps its established layout."""
+    _add_march_data(db, user, account)
+
+    text = format_report_text(_march_report(db, user))
+
+    assert text == (
+        "📊 Отчёт за 01.03.2025–31.03.2025:\n"
+        "\n"
+        "💰 Доходы (RUB): 500,00 RUB\n"
+        "💸 Расходы (RUB): 170,50 RUB\n"
+        "📈 Сальдо (RUB): 329,50 RUB\n"
+        "\n"
+        "💰 Доходы (USD): 0,00 USD\n"
+        "💸 Расходы (USD): 5,00 USD\n"
+        "📈 Сальдо (USD): -5,00 USD\n"
+        "\n"
+        "💳 Баланс сейчас (все счета):\n"
+        "  • RUB: 330,50 RUB\n"
+        "  • USD: 95,00 USD\n"
+        "\n"
+        "📥 Откуда пришли (доходы, RUB):\n"
+        "  1. Зарплата — 500,00 RUB (100.0%)\n"
+        "\n"
+        "📤 Куда ушли (расходы, RUB):\n"
+        "  1. Еда — 150,50 RUB (88.3%)\n"
+        "  2. Без категории — 20,00 RUB (11.7%)\n"
+        "\n"
+        "📤 Куда ушли (расходы, USD):\n"
+        "  1. Кофе — 5,00 USD (100.0%)\n"
+    )
+
+
+def test_report_text_repeated_call_is_stable(db: Session, user: User, account: Account):
+    """Test formatting the same report twice (second call is served from the cache)."""
+    _add_march_data(db, user, account)
+    report = _march_report(db, user)
+
+    first = format_report_text(report)
+
+    assert format_report_text(report) == first
+    assert format_report_text(_march_report(db, user)) == first
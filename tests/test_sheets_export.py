@@ -0,0 +1,131 @@
+"""Tests for Google Sheets export data."""
+from decimal import Decimal
+from datetime import datetime
+from sqlalchemy.orm import Session
+
+from db.models import User, Account
+from services.ledger import get_or_create_user, create_account, add_income, add_expense, transfer
+from services.sheets_export import (
+    build_month_transactions_export, get_user_transaction_months,
+    get_account_names, get_month_category_totals,
+)
+
+
+def _summary(rows):
+    """Collect summary (label, value) pairs from columns I-J."""
+    return [tuple(row[8:10]) for row in rows[3:] if len(row) > 8]
+
+
+def test_month_export_summary_totals(db: Session, user: User, account: Account):
+    """Test summary totals per currency and expense categories."""
+    usd = create_account(db, user.id, "Доллары", "USD", Decimal("100.00"))
+    add_income(db, user.id, Decimal("500.00"), "RUB", account.id, category="Зарплата",
+               operation_date=datetime(2025, 3, 1, 10, 0))
+    add_expense(db, user.id, Decimal("100.00"), "RUB", account.id, category="Еда",
+                operation_date=datetime(2025, 3, 2, 10, 0))
+    add_expense(db, user.id, Decimal("50.50"), "RUB", account.id, category="Еда",
+                operation_date=datetime(2025, 3, 3, 10, 0))
+    add_expense(db, user.id, Decimal("20.00"), "RUB", account.id,
+                operation_date=datetime(2025, 3, 4, 10, 0))
+    add_expense(db, user.id, Decimal("5.00"), "USD", usd.id, category="Кофе",
+                operation_date=datetime(2025, 3, 5, 10, 0))
+    transfer(db, user.id, Decimal("10.00"), "RUB", account.id, usd.id, to_amount=Decimal("0.10"),
+             operation_date=datetime(2025, 3, 6, 10, 0))
+    # Outside the month
+    add_expense(db, user.id, Decimal("999.00"), "RUB", account.id, category="Еда",
+                operation_date=datetime(2025, 4, 1, 0, 0))
+
+    rows = list(build_month_transactions_export(db, user.id, 2025, 3))
+
+    # Summary runs alongside the 6 transaction rows and continues below them
+    assert len(rows) == 3 + 12
+    assert _summary(rows) == [
+        ("💰 Доходы (RUB):", 500.0),
+        ("💸 Расходы (RUB):", 170.5),
+        ("📈 Сальдо (RUB):", 329.5),
+        ("", ""),
+        ("💰 Доходы (USD):", 0.0),
+        ("💸 Расходы (USD):", 5.0),
+        ("📈 Сальдо (USD):", -5.0),
+        ("", ""),
+        ("📂 По категориям:", ""),
+        ("  Еда", 150.5),
+        ("  Без категории", 20.0),
+        ("  Кофе", 5.0),
+    ]
+
+
+def test_month_export_rows_newest_first(db: Session, user: User, account: Account):
+    """Test transaction rows are sorted by date descending with account names."""
+    add_expense(db, user.id, Decimal("1.00"), "RUB", account.id, description="Первая",
+                operation_date=datetime(2025, 3, 1, 9, 5))
+    add_expense(db, user.id, Decimal("2.00"), "RUB", account.id,
+                operation_date=datetime(2025, 3, 2, 18, 30))
+
+    rows = list(build_month_transactions_export(db, user.id, 2025, 3))
+
+    assert rows[3][:8] == ["02.03.2025 18:30", "расход", 2.0, "RUB", "Основной", "Без категории", "—", ""]
+    assert rows[4][:8] == ["01.03.2025 09:05", "расход", 1.0, "RUB", "Основной", "Без категории", "Первая", ""]
+
+
+def test_month_export_empty(db: Session, user: User):
+    """Test empty month yields placeholder row."""
+    rows = list(build_month_transactions_export(db, user.id, 2025, 3))
+
+    assert rows[-1][0] == "Нет операций за 2025-03"
+
+
+def test_month_export_category_ties_by_name(db: Session, user: User, account: Account):
+    """Test categories with equal totals are listed by name."""
+    for category in ("Транспорт", "Еда", None):
+        add_expense(db, user.id, Decimal("10.00"), "RUB", account.id, category=category,
+                    operation_date=datetime(2025, 3, 1, 10, 0))
+
+    rows = list(build_month_transactions_export(db, user.id, 2025, 3))
+
+    assert _summary(rows)[-3:] == [("  Без категории", 10.0), ("  Еда", 10.0), ("  Транспорт", 10.0)]
+
+
+def test_month_export_with_prefetched_totals(db: Session, user: User, account: Account):
+    """Test one grouped totals query per sync gives the same sheets as per-month queries."""
+    usd = create_account(db, user.id, "Доллары", "USD", Decimal("100.00"))
+    add_income(db, user.id, Decimal("500.00"), "RUB", account.id, category="Зарплата",
+               operation_date=datetime(2025, 3, 1, 0, 0))
+    add_expense(db, user.id, Decimal("100.10"), "RUB", account.id, category="Еда",
+                operation_date=datetime(2025, 3, 31, 23, 59, 59, 500000))
+    add_expense(db, user.id, Decimal("5.00"), "USD", usd.id, category="Кофе",
+                operation_date=datetime(2025, 3, 5, 10, 0))
+    transfer(db, user.id, Decimal("10.00"), "RUB", account.id, usd.id, to_amount=Decimal("0.10"),
+             operation_date=datetime(2025, 2, 6, 10, 0))
+    add_expense(db, user.id, Decimal("7.00"), "RUB", account.id,
+                operation_date=datetime(2024, 12, 31, 23, 0))
+
+    account_names = get_account_names(db, user.id)
+    totals_by_month = get_month_category_totals(db, user.id)
+
+    assert set(totals_by_month) == {(2025, 3), (2024, 12)}  # Transfers have no totals
+    for year, month in get_user_transaction_months(db, user.id):
+        prefetched = list(build_month_transactions_export(
+            db, user.id, year, month,
+            account_names=account_names,
+            category_totals=totals_by_month.get((year, month), ()),
+        ))
+        assert prefetched == list(build_month_transactions_export(db, user.id, year, month))
+    # The last microseconds of a month belong to it
+    march = list(build_month_transactions_export(db, user.id, 2025, 3))
+    assert len([row for row in march[3:] if row[0]]) == 3
+
+
+def test_user_transaction_months(db: Session, user: User, account: Account):
+    """Test distinct months are listed newest first and honour the limit."""
+    for when in (datetime(2024, 12, 31, 23, 59), datetime(2025, 1, 1, 0, 0),
+                 datetime(2025, 1, 20, 12, 0), datetime(2025, 3, 1, 8, 0)):
+        add_expense(db, user.id, Decimal("1.00"), "RUB", account.id, operation_date=when)
+    other = get_or_create_user(db, 777, "Europe/Moscow")
+    other_account = create_account(db, other.id, "Чужой", "RUB", Decimal("10.00"))
+    add_expense(db, other.id, Decimal("1.00"), "RUB", other_account.id,
+                operation_date=datetime(2025, 2, 10, 12, 0))
+
+    assert get_user_transaction_months(db, user.id) == [(2025, 3), (2025, 1), (2024, 12)]
+    assert get_user_transaction_months(db, user.id, limit=2) == [(2025, 3), (2025, 1)]
+    assert get_user_transaction_months(db, other.id) == [(2025, 2)]
@@ -4,10 +4,10 @@ from decimal import Decimal
 from datetime import datetime, timedelta
 
 from utils.dates import (
-    format_date, format_operation_date, parse_period,
+    format_date, format_operation_date, parse_period, get_prev_period,
     get_user_timezone, now_in_timezone
 )
-from utils.money import format_amount
+from utils.money import format_amount, from_cents, group_by_currency
 
 
 # === Money Formatting Tests ===
@@ -36,6 +36,26 @@ def test_format_amount_large():
     assert "000" in result
 
 
+@pytest.mark.parametrize("cents", [150, Decimal("150"), Decimal("150.0")], ids=["int", "decimal", "numeric"])
+def test_from_cents_accepts_int_and_decimal(cents):
+    """Test cents sums convert the same whether the driver returns int or Decimal (numeric)."""
+    assert from_cents(cents) == Decimal("1.50")
+    assert format_amount(from_cents(cents), "RUB") == format_amount(Decimal("1.50"), "RUB")
+
+
+def test_format_amount_negative_zero():
+    """Test -0 formats like 0 regardless of which was cached first."""
+    for amount in (Decimal("-0.00"), Decimal("0.00"), Decimal("-0.001")):
+        assert format_amount(amount, "RUB") == "0,00 RUB"
+
+
+def test_group_by_currency():
+    """Test summing (currency, amount) pairs and dict input."""
+    pairs = [("RUB", Decimal("10.50")), ("USD", Decimal("1.00")), ("RUB", Decimal("0.25"))]
+    assert group_by_currency(pairs) == {"RUB": Decimal("10.75"), "USD": Decimal("1.00")}
+    assert group_by_currency({"EUR": Decimal("3.00")}) == {"EUR": Decimal("3.00")}
+
+
 # === Date Formatting Tests ===
 
 def test_format_date_datetime():
@@ -60,9 +80,21 @@ def test_format_date_custom_format():
 
 def test_format_operation_date_today():
     """Test formatting operation date for today."""
-    now = datetime.now()
-    now_str = now.isoformat()
-    result = format_operation_date(now_str)
+    now = datetime(2025, 12, 18, 14, 0)
+    result = format_operation_date(datetime(2025, 12, 18, 13, 5).isoformat(), now=now)
+    assert result == "сегодня, 13:05"
+
+
+def test_format_operation_date_yesterday():
+    """Test formatting operation date for yesterday."""
+    now = datetime(2025, 12, 18, 0, 30)
+    result = format_operation_date(datetime(2025, 12, 17, 23, 45).isoformat(), now=now)
+    assert result == "вчера, 23:45"
+
+
+def test_format_operation_date_default_now():
+    """Test current time is used when now is not given."""
+    result = format_operation_date(datetime.now().isoformat())
     assert "сегодня" in result
 
 
@@ -75,8 +107,8 @@ def test_format_operation_date_none():
 def test_format_operation_date_other():
     """Test formatting date from past."""
     past = datetime(2025, 1, 15, 14, 30)
-    result = format_operation_date(past.isoformat())
-    assert "15.01" in result
+    result = format_operation_date(past.isoformat(), now=datetime(2025, 12, 18, 14, 0))
+    assert result == "15.01, 14:30"
 
 
 # === Timezone Tests ===
@@ -117,9 +149,49 @@ def test_parse_period_month():
     assert start.day == 1
 
 
+def test_parse_period_month_ends_at_end_of_last_day():
+    """Test month period ends at the last microsecond of the month."""
+    start, end = parse_period("month", None, None, "Europe/London")
+    assert (end.hour, end.minute, end.second, end.microsecond) == (23, 59, 59, 999999)
+    assert (end + timedelta(microseconds=1)).day == 1
+
+
+def test_parse_period_year():
+    """Test parsing year period."""
+    start, end = parse_period("year", None, None, "Europe/London")
+    assert (start.month, start.day, start.hour) == (1, 1, 0)
+    assert (end.month, end.day, end.hour, end.minute) == (12, 31, 23, 59)
+
+
+def test_prev_period_adjoins_current():
+    """Test previous period ends right before the current one starts."""
+    for preset in ("today", "week", "month", "year"):
+        start, _ = parse_period(preset, None, None, "Europe/London")
+        prev_start, prev_end = get_prev_period(preset, "Europe/London")
+        assert prev_start < prev_end
+        assert (prev_end + timedelta(microseconds=1)).replace(tzinfo=None) == start.replace(tzinfo=None)
+
+
+def test_periods_resolve_against_given_now():
+    """Test presets use the injected now, including the January rollover."""
+    now = datetime(2025, 1, 15, 12, 0, tzinfo=get_user_timezone("Europe/London"))
+    start, end = parse_period("month", None, None, "Europe/London", now=now)
+    prev_start, prev_end = get_prev_period("month", "Europe/London", now=now)
+    assert (start.date(), end.date()) == (datetime(2025, 1, 1).date(), datetime(2025, 1, 31).date())
+    assert (prev_start.date(), prev_end.date()) == (datetime(2024, 12, 1).date(), datetime(2024, 12, 31).date())
+
+
 def test_parse_period_custom():
     """Test parsing custom period."""
     start, end = parse_period("custom", "2025-12-01", "2025-12-31", "Europe/London")
     assert start.day == 1
     assert end.day == 31
 
+
+
+def test_parse_period_custom_invalid_falls_back_to_today():
+    """Test malformed custom dates fall back to today."""
+    now = datetime(2025, 6, 10, 15, 0, tzinfo=get_user_timezone("Europe/London"))
+    for from_date in ("вчера", "2025-13-01"):
+        start, end = parse_period("custom", from_date, "2025-12-31", "Europe/London", now=now)
+        assert start.date() == end.date() == now.date()
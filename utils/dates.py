@@ -1,15 +1,18 @@
 """Date utilities."""
+import re
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional, Tuple
-import pytz
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 
-def get_user_timezone(timezone_str: str = "Europe/London") -> pytz.BaseTzInfo:
-    """Get timezone object from string."""
+@lru_cache(maxsize=512)
+def get_user_timezone(timezone_str: str = "Europe/London") -> ZoneInfo:
+    """Get timezone object from string (cached: tz objects are immutable and shared)."""
     try:
-        return pytz.timezone(timezone_str)
-    except pytz.exceptions.UnknownTimeZoneError:
-        return pytz.timezone("Europe/London")
+        return ZoneInfo(timezone_str)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo("Europe/London")
 
 
 def now_in_timezone(timezone_str: str = "Europe/London") -> datetime:
@@ -18,99 +21,114 @@ def now_in_timezone(timezone_str: str = "Europe/London") -> datetime:
     return datetime.now(tz)
 
 
+@lru_cache(maxsize=4096)
+def _parse_iso(value: str) -> datetime:
+    """Parse an ISO 8601 string, accepting a trailing 'Z' (cached: datetimes are immutable)."""
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+# Cheap shape check before handing custom period bounds to the ISO parser
+_ISO_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+_ONE_DAY = timedelta(days=1)
+_SIX_DAYS = timedelta(days=6)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def _day_range(now: datetime, prev: bool = False) -> Tuple[datetime, datetime]:
+    """Today (or yesterday)."""
+    day = now - _ONE_DAY if prev else now
+    start = day.replace(hour=0, minute=0, second=0, microsecond=0)
+    end = day.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return start, end
+
+
+def _week_range(now: datetime, prev: bool = False) -> Tuple[datetime, datetime]:
+    """Current (or previous) week, Monday to Sunday."""
+    days_back = now.weekday() + (7 if prev else 0)
+    start = (now - timedelta(days=days_back)).replace(hour=0, minute=0, second=0, microsecond=0)
+    end = (start + _SIX_DAYS).replace(hour=23, minute=59, second=59, microsecond=999999)
+    return start, end
+
+
+def _month_range(now: datetime, prev: bool = False) -> Tuple[datetime, datetime]:
+    """Current (or previous) calendar month."""
+    year, month = now.year, now.month
+    if prev:
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    start = now.replace(year=year, month=month, day=1, hour=0, minute=0, second=0, microsecond=0)
+    if month == 12:
+        end = start.replace(year=year + 1, month=1) - _ONE_MICROSECOND
+    else:
+        end = start.replace(month=month + 1) - _ONE_MICROSECOND
+    return start, end
+
+
+def _year_range(now: datetime, prev: bool = False) -> Tuple[datetime, datetime]:
+    """Current (or previous) calendar year."""
+    year = now.year - 1 if prev else now.year
+    start = now.replace(year=year, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = start.replace(year=year + 1) - _ONE_MICROSECOND
+    return start, end
+
+
+# Period preset -> (now, prev) -> (start, end)
+_PERIOD_RANGES = {
+    "today": _day_range,
+    "week": _week_range,
+    "month": _month_range,
+    "year": _year_range,
+}
+
+
 def parse_period(
     period_preset: Optional[str],
     from_date: Optional[str],
     to_date: Optional[str],
-    user_timezone: str = "Europe/London"
+    user_timezone: str = "Europe/London",
+    now: Optional[datetime] = None
 ) -> Tuple[datetime, datetime]:
     """
     Parse period from preset or dates.
     Returns (start, end) datetime in user timezone.
+
+    now defaults to the current time in user_timezone; pass it to resolve
+    several periods against the same instant.
     """
-    tz = get_user_timezone(user_timezone)
-    now = datetime.now(tz)
-
-    if period_preset == "today":
-        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        end = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-    elif period_preset == "week":
-        # Current week (Monday to Sunday)
-        days_since_monday = now.weekday()
-        start = (now - timedelta(days=days_since_monday)).replace(hour=0, minute=0, second=0, microsecond=0)
-        end = (start + timedelta(days=6)).replace(hour=23, minute=59, second=59, microsecond=999999)
-    elif period_preset == "month":
-        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        if now.month == 12:
-            end = now.replace(year=now.year + 1, month=1, day=1) - timedelta(microseconds=1)
-        else:
-            end = now.replace(month=now.month + 1, day=1) - timedelta(microseconds=1)
-    elif period_preset == "year":
-        start = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        end = now.replace(year=now.year + 1, month=1, day=1) - timedelta(microseconds=1)
-    elif from_date and to_date:
-        # Custom period
+    period_range = _PERIOD_RANGES.get(period_preset)
+    if period_range:
+        return period_range(now if now is not None else now_in_timezone(user_timezone))
+
+    if from_date and to_date and _ISO_DATE_RE.match(from_date) and _ISO_DATE_RE.match(to_date):
+        # Custom period; the user timezone is only needed for naive dates
         try:
-            start = datetime.fromisoformat(from_date.replace("Z", "+00:00"))
+            start = _parse_iso(from_date)
             if not start.tzinfo:
-                start = tz.localize(start)
-            end = datetime.fromisoformat(to_date.replace("Z", "+00:00"))
+                start = start.replace(tzinfo=get_user_timezone(user_timezone))
+            end = _parse_iso(to_date)
             if not end.tzinfo:
-                end = tz.localize(end)
+                end = end.replace(tzinfo=get_user_timezone(user_timezone))
             # Set to end of day
             end = end.replace(hour=23, minute=59, second=59, microsecond=999999)
-        except (ValueError, AttributeError):
-            # Fallback to today
-            start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            end = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-    else:
-        # Default to today
-        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        end = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+            return start, end
+        except ValueError:
+            pass  # Fallback to today (e.g. "2025-13-01")
 
-    return start, end
+    # Default to today
+    return _day_range(now if now is not None else now_in_timezone(user_timezone))
 
 
 def get_prev_period(
     period_preset: str,
-    user_timezone: str = "Europe/London"
+    user_timezone: str = "Europe/London",
+    now: Optional[datetime] = None
 ) -> Tuple[datetime, datetime]:
-    """Get previous period for comparison."""
-    tz = get_user_timezone(user_timezone)
-    now = datetime.now(tz)
-
-    if period_preset == "today":
-        prev_date = now - timedelta(days=1)
-        start = prev_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end = prev_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-    elif period_preset == "week":
-        days_since_monday = now.weekday()
-        current_week_start = (now - timedelta(days=days_since_monday)).replace(hour=0, minute=0, second=0, microsecond=0)
-        prev_week_start = current_week_start - timedelta(days=7)
-        start = prev_week_start
-        end = (prev_week_start + timedelta(days=6)).replace(hour=23, minute=59, second=59, microsecond=999999)
-    elif period_preset == "month":
-        if now.month == 1:
-            prev_month = 12
-            prev_year = now.year - 1
-        else:
-            prev_month = now.month - 1
-            prev_year = now.year
-        start = now.replace(year=prev_year, month=prev_month, day=1, hour=0, minute=0, second=0, microsecond=0)
-        if prev_month == 12:
-            end = now.replace(year=prev_year + 1, month=1, day=1) - timedelta(microseconds=1)
-        else:
-            end = now.replace(year=prev_year, month=prev_month + 1, day=1) - timedelta(microseconds=1)
-    elif period_preset == "year":
-        start = now.replace(year=now.year - 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        end = now.replace(year=now.year, month=1, day=1) - timedelta(microseconds=1)
-    else:
-        # Default to previous day
-        prev_date = now - timedelta(days=1)
-        start = prev_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end = prev_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-    return start, end
+    """Get previous period for comparison (previous day by default)."""
+    if now is None:
+        now = now_in_timezone(user_timezone)
+    return _PERIOD_RANGES.get(period_preset, _day_range)(now, prev=True)
 
 
 def format_datetime(dt: datetime, format_str: str = "%d.%m.%Y %H:%M") -> str:
@@ -121,32 +139,52 @@ def format_datetime(dt: datetime, format_str: str = "%d.%m.%Y %H:%M") -> str:
 def format_date(dt, format_str: str = "%d.%m.%Y") -> str:
     """Format date to string. Accepts datetime or string."""
     if isinstance(dt, str):
-        # Try to parse the string
-        try:
-            dt = datetime.fromisoformat(dt.replace("Z", "+00:00"))
-        except ValueError:
-            return dt  # Return as-is if parsing fails
+        return _format_date_str(dt, format_str)
+    return _format_date_dt(dt, format_str)
+
+
+def _format_date_dt(dt, format_str: str) -> str:
+    """Format a date/datetime object."""
+    if format_str == "%d.%m.%Y":
+        return f"{dt.day:02d}.{dt.month:02d}.{dt.year}"
     return dt.strftime(format_str)
 
 
-def format_operation_date(date_str: str) -> str:
-    """Format operation date for user display. E.g. '18.12, 19:54' or 'сегодня'."""
+@lru_cache(maxsize=2048)
+def _format_date_str(value: str, format_str: str) -> str:
+    """Format an ISO date string (cached: listings repeat the same days)."""
+    try:
+        dt = _parse_iso(value)
+    except ValueError:
+        return value  # Return as-is if parsing fails
+    return _format_date_dt(dt, format_str)
+
+
+def format_operation_date(date_str: str, now: Optional[datetime] = None) -> str:
+    """Format operation date for user display. E.g. '18.12, 19:54' or 'сегодня'.
+
+    now defaults to the current time (in the date's own timezone if it has one).
+    """
     if not date_str:
         return "сегодня"
     
     try:
-        dt = datetime.fromisoformat(date_str.replace("Z", "+00:00"))
-        now = datetime.now(dt.tzinfo) if dt.tzinfo else datetime.now()
+        dt = _parse_iso(date_str)
+        if now is None:
+            now = datetime.now(dt.tzinfo) if dt.tzinfo else datetime.now()
         
+        dt_date = dt.date()
+        now_date = now.date()
         # Check if today
-        if dt.date() == now.date():
-            return f"сегодня, {dt.strftime('%H:%M')}"
+        time_str = f"{dt.hour:02d}:{dt.minute:02d}"
+        if dt_date == now_date:
+            return f"сегодня, {time_str}"
         # Check if yesterday
-        elif dt.date() == (now.date() - timedelta(days=1)):
-            return f"вчера, {dt.strftime('%H:%M')}"
+        elif dt_date == now_date - _ONE_DAY:
+            return f"вчера, {time_str}"
         # Otherwise show date
         else:
-            return dt.strftime("%d.%m, %H:%M")
+            return f"{dt.day:02d}.{dt.month:02d}, {time_str}"
     except (ValueError, AttributeError):
         return date_str
 
@@ -1,26 +1,47 @@
 """Money formatting utilities."""
+from collections import defaultdict
 from decimal import Decimal
-from typing import Dict
+from functools import lru_cache
+from typing import Dict, Iterable, Mapping, Tuple, Union
 
 
+# "1,234.56" -> "1 234,56" in one pass
+_RU_TRANS = str.maketrans({",": " ", ".": ","})
+
+
+@lru_cache(maxsize=4096)
 def format_amount(amount: Decimal, currency: str = "RUB") -> str:
-    """Format amount with currency."""
-    amount_str = f"{amount:,.2f}".replace(",", " ").replace(".", ",")
-    return f"{amount_str} {currency}"
+    """Format amount with currency (cached: reports repeat the same amounts a lot)."""
+    return f"{_format_number(amount)} {currency}"
 
 
+@lru_cache(maxsize=4096)
 def format_amount_simple(amount: Decimal) -> str:
     """Format amount without currency."""
-    return f"{amount:,.2f}".replace(",", " ").replace(".", ",")
+    return _format_number(amount)
+
+
+def _format_number(amount: Decimal) -> str:
+    """Format "1 234,56"; zero is always unsigned.
+
+    -0 and 0 are equal cache keys, and tiny negatives round to -0,00, so an
+    unsigned zero keeps cached output independent of call order.
+    """
+    amount_str = f"{amount:,.2f}".translate(_RU_TRANS)
+    return "0,00" if amount_str == "-0,00" else amount_str
+
 
+def from_cents(cents: int) -> Decimal:
+    """Convert integer cents (minor units, int or integral Decimal) to a 2-place Decimal."""
+    return Decimal(cents).scaleb(-2)
 
-def group_by_currency(amounts: Dict[str, Decimal]) -> Dict[str, Decimal]:
-    """Group amounts by currency."""
-    result = {}
-    for currency, amount in amounts.items():
-        if currency in result:
-            result[currency] += amount
-        else:
-            result[currency] = amount
-    return result
 
+def group_by_currency(
+    amounts: Union[Mapping[str, Decimal], Iterable[Tuple[str, Decimal]]]
+) -> Dict[str, Decimal]:
+    """Sum amounts by currency. Accepts {currency: amount} or (currency, amount) pairs."""
+    pairs = amounts.items() if isinstance(amounts, Mapping) else amounts
+    result = defaultdict(Decimal)
+    for currency, amount in pairs:
+        result[currency] += amount
+    return dict(result)